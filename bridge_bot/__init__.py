@@ -43,8 +43,6 @@ from telethon.sessions import StringSession
 
 from .config import bot, conf
 
-heavy_proc_lock = asyncio.Lock()
-
 local_gcdb = ".local_groups.pkl"
 log_file_name = "logs.txt"
 sudo_btn_lock = asyncio.Lock()
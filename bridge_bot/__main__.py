@@ -14,7 +14,7 @@ from . import (
     time,
     traceback,
 )
-from .startup.after import on_startup
+from .startup.after import before_restart, on_startup
 from .utils.events import POLL, Event, on_message
 from .utils.os_utils import re_x
 from .utils.sudo_button_utils import poll_as_button_handler
@@ -45,6 +45,7 @@ async def on_logout(_: NewAClient, __: LoggedOutEv):
     LOGS.info("Bot has been logged out.")
     LOGS.info("Restarting…")
     time.sleep(10)
+    await before_restart()
     re_x()
 
 
@@ -53,6 +54,7 @@ async def _(_: NewAClient, __: DisconnectedEv):
     if not bot.is_connected:
         LOGS.info("Restarting…")
         time.sleep(1)
+        await before_restart()
         re_x()
 
 
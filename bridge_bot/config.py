@@ -19,6 +19,7 @@ class Config:
             self.DB_ID = config("DB_ID", default="0000")
             self.DBNAME = config("DBNAME", default="WA2TG_BRIDGE")
             self.DEBUG = config("DEBUG", default=False, cast=bool)
+            self.DEDUPE_SIZE = config("DEDUPE_SIZE", default=10000, cast=int)
             self.DEV = config("DEV", default="")
             self.DYNO = config("DYNO", default=None)
             self.FS_THRESHOLD = config("FLOOD_SLEEP_THRESHOLD", default=600, cast=int)
@@ -28,7 +29,57 @@ class Config:
             self.R_USER_NAME = config("REDDIT_USERNAME", default="")
             self.UB_REC_EVENTS = config("UB_REC_EVENTS", default=False, cast=bool)
             self.LOG_GROUP = config("LOG_GROUP", default="")
+            self.MEDIA_RAM_BUDGET = config(
+                "MEDIA_RAM_BUDGET", default=536870912, cast=int
+            )
+            self.MEDIA_SPOOL_THRESHOLD = config(
+                "MEDIA_SPOOL_THRESHOLD", default=20971520, cast=int
+            )
+            self.MEDIA_JOB_TIMEOUT = config("MEDIA_JOB_TIMEOUT", default=120, cast=int)
+            self.MEDIA_WORKERS = config("MEDIA_WORKERS", default=0, cast=int)
+            self.FIT_VIDEO_TO_LIMIT = config(
+                "FIT_VIDEO_TO_LIMIT", default=False, cast=bool
+            )
+            self.FIT_CACHE_SIZE = config("FIT_CACHE_SIZE", default=10, cast=int)
+            self.IDENTITY_CACHE_SIZE = config(
+                "IDENTITY_CACHE_SIZE", default=10000, cast=int
+            )
+            self.IDENTITY_CACHE_TTL = config(
+                "IDENTITY_CACHE_TTL", default=86400, cast=int
+            )
+            self.IDENTITY_NEGATIVE_TTL = config(
+                "IDENTITY_NEGATIVE_TTL", default=3600, cast=int
+            )
+            self.TG_ENTITY_CACHE_SIZE = config(
+                "TG_ENTITY_CACHE_SIZE", default=5000, cast=int
+            )
+            self.TG_ENTITY_CACHE_TTL = config(
+                "TG_ENTITY_CACHE_TTL", default=21600, cast=int
+            )
+            self.COMPACT_MSG_STORE = config(
+                "COMPACT_MSG_STORE", default=False, cast=bool
+            )
+            self.MSG_DB_IDLE_TIMEOUT = config(
+                "MSG_DB_IDLE_TIMEOUT", default=3600, cast=int
+            )
+            self.MSG_CACHE_SIZE = config("MSG_CACHE_SIZE", default=4096, cast=int)
+            self.MSG_FLUSH_INTERVAL = config(
+                "MSG_FLUSH_INTERVAL", default=2.0, cast=float
+            )
+            self.MSG_FLUSH_SIZE = config("MSG_FLUSH_SIZE", default=100, cast=int)
+            self.MSG_WRITE_BEHIND = config("MSG_WRITE_BEHIND", default=False, cast=bool)
+            self.MSG_PRUNE_INTERVAL = config(
+                "MSG_PRUNE_INTERVAL", default=3600, cast=int
+            )
+            self.MSG_RETENTION_DAYS = config("MSG_RETENTION_DAYS", default=0, cast=int)
+            self.MSG_RETENTION_ROWS = config("MSG_RETENTION_ROWS", default=0, cast=int)
+            self.MSG_STORE_BACKEND = config("MSG_STORE_BACKEND", default="orm")
             self.OWNER = config("OWNER")
+            self.REVOKE_CONCURRENCY = config("REVOKE_CONCURRENCY", default=5, cast=int)
+            self.SINGLE_MSG_DB = config("SINGLE_MSG_DB", default=False, cast=bool)
+            self.STICKER_CACHE_SIZE = config(
+                "STICKER_CACHE_SIZE", default=104857600, cast=int
+            )
             self.WA_DB = config("WA_DB", default="db.sqlite3")
             self.WORKERS = config("WORKERS", default=20, cast=int)
         except Exception:
@@ -4,3 +4,11 @@ class ArgumentParserError(Exception):
 
 class CreateSudoBtnError(Exception):
     pass
+
+
+class TranscodeCancelled(Exception):
+    pass
+
+
+class MediaJobTimeout(Exception):
+    pass
@@ -16,10 +16,27 @@ from bridge_bot import (
 )
 from bridge_bot.fun.emojis import enmoji, enmoji2
 from bridge_bot.fun.quips import enquip, enquip2
+from bridge_bot.utils.event_dedupe import (
+    auto_save_seen_events,
+    load_seen_events,
+    save_seen_events,
+)
+from bridge_bot.utils.identity_cache import (
+    auto_save_identity_cache,
+    load_identity_cache,
+    save_identity_cache,
+)
 from bridge_bot.utils.log_utils import logger
-from bridge_bot.utils.msg_store import initialize_all_sessions
+from bridge_bot.utils.media_worker import shutdown_media_worker
+from bridge_bot.utils.msg_store import (
+    auto_prune_message_stores,
+    flush_all_writes,
+    initialize_all_sessions,
+    reap_idle_sessions,
+)
 from bridge_bot.utils.msg_utils import send_presence
 from bridge_bot.utils.reddit import auto_fetch_reddit_posts
+from bridge_bot.utils.route_utils import rebuild_routes
 
 
 async def onrestart():
@@ -52,6 +69,22 @@ async def onstart(text="*Please restart me.*"):
     )
 
 
+async def before_restart():
+    """
+    Saves what would otherwise be lost when the process is replaced;
+    must be awaited before every re_x()/updater() and on shutdown.
+    """
+    try:
+        await flush_all_writes()
+    except Exception:
+        await logger(Exception)
+    try:
+        save_seen_events()
+        save_identity_cache()
+    except Exception:
+        await logger(Exception)
+
+
 async def on_termination():
     try:
         dead_msg = f"*I'm* {enquip2()} {enmoji2()}"
@@ -63,6 +96,8 @@ async def on_termination():
     except Exception:
         pass
     # More cleanup code?
+    await before_restart()
+    shutdown_media_worker()
     await bot.client.stop()
 
 
@@ -115,6 +150,9 @@ async def on_startup():
                 getattr(signal, signame),
                 lambda: asyncio.create_task(on_termination()),
             )
+        rebuild_routes()
+        load_identity_cache()
+        load_seen_events()
         await initialize_all_sessions()
         await initialize_reddit_client()
         while not bot.is_connected:
@@ -126,6 +164,10 @@ async def on_startup():
             await onstart(f"*I'm {enquip()} {enmoji()}*")
         asyncio.create_task(update_presence())
         asyncio.create_task(auto_fetch_reddit_posts())
+        asyncio.create_task(reap_idle_sessions())
+        asyncio.create_task(auto_prune_message_stores())
+        asyncio.create_task(auto_save_identity_cache())
+        asyncio.create_task(auto_save_seen_events())
         LOGS.info("Bot has started.")
     except Exception:
         await logger(Exception)
@@ -103,6 +103,9 @@ class BaseEvent(ABC):
         # Finally the Neonize Message Event
         self.message: MessageEv | None = None
 
+        # Results computed once & reused by every chat the event is bridged to
+        self.shared_results: dict = {}
+
     def __str__(self):
         def serialize(obj):
             if isinstance(obj, (str, int, float, bool, type(None))):
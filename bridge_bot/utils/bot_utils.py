@@ -1,8 +1,6 @@
 import asyncio
 import datetime
-import io
 import itertools
-import zipfile
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from hashlib import sha256
@@ -22,6 +20,8 @@ from telethon.tl.types import (
 
 from bridge_bot import bot
 
+from .cache_utils import LRUCache
+
 THREADPOOL = ThreadPoolExecutor(max_workers=1000)
 
 
@@ -171,15 +171,15 @@ def split_list_in_half(list_: list):
     return (list_[: len(list_) // 2], list_[len(list_) // 2 :])
 
 
-async def get_sticker_pack(event):
+def get_input_sticker_set(event):
     for attrib in event.sticker.attributes:
         if isinstance(attrib, DocumentAttributeSticker):
-            stickerset = attrib.stickerset
-            break
-    else:
-        raise Exception(
-            "Could not find the sticker attribute in the list of attributes."
-        )
+            return attrib.stickerset
+    raise Exception("Could not find the sticker attribute in the list of attributes.")
+
+
+async def get_sticker_pack(event):
+    stickerset = get_input_sticker_set(event)
     if isinstance(stickerset, InputStickerSetEmpty):
         return None
     return await event.client(
@@ -187,6 +187,23 @@ async def get_sticker_pack(event):
     )
 
 
+# Sticker set id / short name -> title
+sticker_set_titles = LRUCache(1024)
+
+
+async def get_sticker_pack_title(event) -> str:
+    """Title of a sticker's set, fetched once per set"""
+    stickerset = get_input_sticker_set(event)
+    if isinstance(stickerset, InputStickerSetEmpty):
+        return "None"
+    key = getattr(stickerset, "id", None) or getattr(stickerset, "short_name", None)
+    if (title := sticker_set_titles.get(key)) is None:
+        pack = await get_sticker_pack(event)
+        title = pack.set.title if pack else "None"
+        sticker_set_titles.set(key, title)
+    return title
+
+
 def entities_has_spoiler(entities):
     if entities:
         for en in entities:
@@ -256,19 +273,6 @@ async def write_binary(file, bytes_):
     return await sync_to_async(stdlib_write, file, bytes_)
 
 
-def prepare_zip_file_content(file_name_content: dict) -> bytes:
-    """
-    returns Zip bytes
-    """
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for file_name, file_data in file_name_content.items():
-            zip_file.writestr(file_name, file_data)
-
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
-
-
 def human_format_num(num):
     num = float("{:.3g}".format(num))
     magnitude = 0
@@ -278,3 +282,13 @@ def human_format_num(num):
     return "{}{}".format(
         "{:f}".format(num).rstrip("0").rstrip("."), ["", "K", "M", "B", "T"][magnitude]
     )
+
+
+def human_format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return "{:.2f}".format(size).rstrip("0").rstrip(".") + unit
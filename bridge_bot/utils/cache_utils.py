@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from functools import partial
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping with hit/miss counters.
+    Not thread-safe; meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def keys(self):
+        return list(self._data)
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def setdefault(self, key, value):
+        if key in self._data:
+            return self._data[key]
+        self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class RecentSet:
+    """
+    Remembers the last `maxsize` keys added, dropping the oldest first;
+    membership is a set lookup instead of a scan.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._keys = set()
+        self._ring = deque()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key) -> bool:
+        """Adds key; returns False if it was already there"""
+        if key in self._keys:
+            return False
+        if self.maxsize <= 0:
+            return True
+        self._keys.add(key)
+        self._ring.append(key)
+        while len(self._ring) > self.maxsize:
+            self._keys.discard(self._ring.popleft())
+        return True
+
+    def clear(self):
+        self._keys.clear()
+        self._ring.clear()
+
+    def dump(self) -> list:
+        """Keys oldest first, for pickling"""
+        return list(self._ring)
+
+    def load(self, keys: list):
+        for key in keys:
+            self.add(key)
+
+
+class TTLCache:
+    """
+    Bounded mapping whose entries expire; values the `negative` predicate
+    matches (failed lookups) get the shorter `negative_ttl`.
+    fetch() shares one in-flight lookup between concurrent callers.
+    Expiry uses wall-clock time so entries stay valid across a save/load.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+        negative_ttl: float = 300,
+        negative=lambda value: not value,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative = negative
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def lookup(self, key) -> (bool, object):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                self._data.pop(key)
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        if ttl is None:
+            ttl = self.negative_ttl if self.negative(value) else self.ttl
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    async def fetch(self, key, func, *args):
+        """
+        Returns the cached value for key, else awaits func(*args) once for
+        all concurrent callers and caches its result; exceptions aren't cached.
+        """
+        hit, value = self.lookup(key)
+        if hit:
+            return value
+        if (task := self._inflight.get(key)) is None:
+            task = asyncio.ensure_future(func(*args))
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._fetched, key))
+        return await asyncio.shield(task)
+
+    def _fetched(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    def dump(self) -> dict:
+        now = time.time()
+        return {k: entry for k, entry in self._data.items() if entry[0] >= now}
+
+    def load(self, data: dict):
+        now = time.time()
+        for key, entry in data.items():
+            if entry[0] >= now:
+                self._data[key] = entry
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+from collections import deque
+
+from bridge_bot import conf
+
+
+def _settle(future: asyncio.Future, task: asyncio.Task):
+    if future.done():
+        if not task.cancelled():
+            task.exception()
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception():
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class ChatQueues:
+    """
+    Runs bridged messages one at a time per (source chat, target chat)
+    pair, in the order they arrived, while different pairs run in
+    parallel; at most `limit` messages are handled at once overall.
+    A busy chat only ever holds one slot, so it can't starve the rest.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.queues = {}
+        self.running = set()
+        self._slots = asyncio.Semaphore(self.limit)
+
+    def submit(self, key: tuple, func, *args) -> asyncio.Future:
+        """
+        Queues func(*args) behind the earlier work for key; must be called
+        before the handler's first await to keep the arrival order.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if (queue := self.queues.get(key)) is None:
+            queue = self.queues[key] = deque()
+            asyncio.create_task(self._drain(key, queue))
+        queue.append((func, args, future))
+        return future
+
+    async def run(self, key: tuple, func, *args):
+        return await self.submit(key, func, *args)
+
+    async def _drain(self, key: tuple, queue: deque):
+        try:
+            while queue:
+                func, args, future = queue[0]
+                if not future.done():
+                    async with self._slots:
+                        self.running.add(key)
+                        try:
+                            task = asyncio.ensure_future(func(*args))
+                            # The caller giving up doesn't stop the message
+                            await asyncio.wait({task})
+                            _settle(future, task)
+                        finally:
+                            self.running.discard(key)
+                queue.popleft()
+        finally:
+            self.queues.pop(key, None)
+
+    def stats(self) -> dict:
+        depths = sorted(
+            ((key, len(queue)) for key, queue in self.queues.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return {
+            "limit": self.limit,
+            "running": len(self.running),
+            "queued": sum(depth for _, depth in depths) - len(self.running),
+            "depths": depths,
+        }
+
+
+chat_queues = ChatQueues(conf.WORKERS)
@@ -0,0 +1,60 @@
+import os
+import pickle
+
+from bridge_bot import asyncio, conf
+
+from .cache_utils import RecentSet
+from .log_utils import log, logger
+
+seen_events_file = ".seen_events.pkl"
+SEEN_SAVE_INTERVAL = 60
+
+# "name:chat:id" of handled WhatsApp events
+wa_seen = RecentSet(conf.DEDUPE_SIZE)
+# (handler, chat, message id, edit date) of handled Telegram updates
+tg_seen = RecentSet(conf.DEDUPE_SIZE)
+
+seen_sets = {"wa": wa_seen, "tg": tg_seen}
+
+
+def first_tg_update(handler, event) -> bool:
+    """
+    False if handler already got this Telegram message (or this edit of it),
+    e.g. when updates are replayed after a reconnect.
+    """
+    edit_date = getattr(event.message, "edit_date", None)
+    key = (
+        handler.__name__,
+        event.chat_id,
+        event.id,
+        edit_date.timestamp() if edit_date else None,
+    )
+    return tg_seen.add(key)
+
+
+def load_seen_events():
+    if not os.path.exists(seen_events_file):
+        return
+    try:
+        with open(seen_events_file, "rb") as file:
+            saved = pickle.load(file)
+        for name, seen in seen_sets.items():
+            seen.load(saved.get(name, []))
+    except Exception:
+        log(Exception)
+
+
+def save_seen_events():
+    if conf.DEDUPE_SIZE <= 0:
+        return
+    with open(seen_events_file, "wb") as file:
+        pickle.dump({name: seen.dump() for name, seen in seen_sets.items()}, file)
+
+
+async def auto_save_seen_events():
+    while True:
+        await asyncio.sleep(SEEN_SAVE_INTERVAL)
+        try:
+            save_seen_events()
+        except Exception:
+            await logger(Exception)
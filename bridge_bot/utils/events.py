@@ -6,8 +6,8 @@ import inspect
 import logging
 import os
 import warnings
-from collections import deque
 from collections.abc import Callable
+from functools import cached_property
 
 import httpx
 from neonize.types import MessageWithContextInfo
@@ -29,6 +29,7 @@ from bridge_bot.config import bot, conf
 from bridge_bot.types.event import BaseEvent, Chat, User
 
 from .bot_utils import write_binary
+from .event_dedupe import wa_seen
 from .log_utils import logger
 
 _log_ = logging.getLogger(__name__)
@@ -156,7 +157,6 @@ class Event(BaseEvent):
             if add_replied and self.media and self.media.contextInfo.ByteSize()
             else None
         )
-        self.reply_to_message = self.get_replied_msg()
         self.is_status = msg_source.Chat.User.casefold() == "status"
         self.constructed = True
         return self
@@ -610,6 +610,11 @@ class Event(BaseEvent):
             patch_msg_sender(msg, bot.client.me.JID, bot.client.me.LID)
         return msg
 
+    @cached_property
+    def reply_to_message(self) -> Event | None:
+        """The replied message, only built when a handler looks at it"""
+        return self.get_replied_msg()
+
     def get_replied_msg(self) -> Event:
         if not (self._context_info and self._context_info.stanzaID):
             return
@@ -632,7 +637,10 @@ class Event(BaseEvent):
 
 POLL = 1
 function_dict = {None: []}
-anti_duplicate = deque(maxlen=10000)
+# catch-all handler -> cheap check on the raw MessageEv, see pre_filter()
+handler_filters = {}
+# Fields that carry no content on their own
+_NOOP_FIELDS = {"messageContextInfo", "senderKeyDistributionMessage"}
 
 
 def register(key: str | None = None):
@@ -651,8 +659,14 @@ def register(key: str | None = None):
     return dec
 
 
-def add_handler(function, command: str | None = None, **kwargs):
-    """Adds an handler using the register decorator"""
+def add_handler(
+    function, command: str | None = None, wants: Callable | None = None, **kwargs
+):
+    """
+    Adds an handler using the register decorator
+    wants: for handlers without a command, a cheap check on the raw
+    MessageEv; events it rejects are not built for this handler.
+    """
     if command:
 
         async def _(client: NewAClient, event: Event):
@@ -663,6 +677,9 @@ def add_handler(function, command: str | None = None, **kwargs):
         async def _(client: NewAClient, event: Event):
             await function(event, None, client)
 
+        if wants:
+            handler_filters[_] = wants
+
     register(command)(_)
     return _
 
@@ -674,6 +691,7 @@ def unregister(key: str | Callable):
         function_dict.pop(key)
     else:
         function_dict[None].remove(key)
+        handler_filters.pop(key, None)
 
 
 bot.add_handler = add_handler
@@ -686,17 +704,55 @@ async def handler_helper(funcs):
     await asyncio.gather(*funcs)
 
 
+def _raw_text(msg: Message) -> str:
+    edited = msg.protocolMessage.editedMessage
+    return (
+        msg.conversation
+        or msg.extendedTextMessage.text
+        or edited.conversation
+        or edited.extendedTextMessage.text
+    )
+
+
+def pre_filter(message: MessageEv) -> list | None:
+    """
+    Looks at the raw event only (chat, message type & text prefix) and
+    returns the catch-all handlers that want it; None if no handler can
+    use it, so building the Event can be skipped.
+    """
+    if message.Info.MessageSource.Chat.Server == "broadcast":
+        # Status updates & broadcast lists
+        return
+    msg = message.Message
+    if all(field.name in _NOOP_FIELDS for field, _ in msg.ListFields()):
+        return
+    funcs = [
+        func
+        for func in function_dict[None]
+        if (wants := handler_filters.get(func)) is None or wants(message)
+    ]
+    if funcs or msg.HasField("pollUpdateMessage"):
+        return funcs
+    if (
+        (text := _raw_text(msg))
+        and (parts := text.split(maxsplit=1))
+        and parts[0] in function_dict
+    ):
+        return funcs
+
+
 async def on_message(client: NewAClient, message: MessageEv):
     try:
         # await logger(e=message)
+        if (handlers := pre_filter(message)) is None:
+            return
         event = construct_event(message)
         if event.pollUpdate:
             return await function_dict[POLL](client, event)
 
         _id = f"{event.name}:{event.chat.id}:{event.id}"
-        if _id in anti_duplicate:
+        if not wa_seen.add(_id):
             return
-        anti_duplicate.append(_id)
         if event.type == "text" and event.text:
             command, args = (
                 event.text.split(maxsplit=1)
@@ -706,9 +762,9 @@ async def on_message(client: NewAClient, message: MessageEv):
             func = function_dict.get(command)
             if func:
                 await func(client, event)
-        if not function_dict[None]:
+        if not handlers:
             return
-        funcs = [func(client, event) for func in function_dict[None]]
+        funcs = [func(client, event) for func in handlers]
         await asyncio.gather(*funcs)
     except Exception:
         await logger(e="Unhandled Exception(s):", error=True)
@@ -0,0 +1,172 @@
+import pickle
+from typing import NamedTuple
+
+from telethon import TelegramClient
+from telethon.types import User
+from telethon.utils import get_peer_id
+
+from bridge_bot import JID, asyncio, bot, conf
+
+from .cache_utils import TTLCache
+from .log_utils import log, logger
+from .os_utils import file_exists
+
+identity_cache_file = ".identity_cache.pkl"
+IDENTITY_SAVE_INTERVAL = 1800
+
+# "user@server" -> ContactInfo
+contact_cache = TTLCache(
+    conf.IDENTITY_CACHE_SIZE,
+    conf.IDENTITY_CACHE_TTL,
+    conf.IDENTITY_NEGATIVE_TTL,
+    negative=lambda info: not info.Found,
+)
+# "user@server" -> the matching LID / phone number JID, None if unknown
+alt_jid_cache = TTLCache(
+    conf.IDENTITY_CACHE_SIZE,
+    conf.IDENTITY_CACHE_TTL,
+    conf.IDENTITY_NEGATIVE_TTL,
+    negative=lambda alt: alt is None,
+)
+# phone number -> is on WhatsApp
+on_wa_cache = TTLCache(
+    conf.IDENTITY_CACHE_SIZE,
+    conf.IDENTITY_CACHE_TTL,
+    conf.IDENTITY_NEGATIVE_TTL,
+)
+
+
+class TGEntity(NamedTuple):
+    """The parts of a Telegram user/chat the bridge headers & mentions use"""
+
+    id: int
+    is_user: bool
+    first_name: str | None = None
+    last_name: str | None = None
+    username: str | None = None
+    title: str | None = None
+
+
+# marked peer id -> TGEntity, None if it couldn't be resolved
+tg_entity_cache = TTLCache(
+    conf.TG_ENTITY_CACHE_SIZE,
+    conf.TG_ENTITY_CACHE_TTL,
+    min(conf.TG_ENTITY_CACHE_TTL, 300),
+    negative=lambda entity: entity is None,
+)
+
+identity_caches = {
+    "contacts": contact_cache,
+    "alt_jids": alt_jid_cache,
+    "on_wa": on_wa_cache,
+}
+
+
+def _key(jid_: JID) -> str:
+    return f"{jid_.User}@{jid_.Server}"
+
+
+async def _lookup_alt_jid(jid_: JID) -> JID | None:
+    try:
+        alt = (
+            await bot.client.get_pn_from_lid(jid_)
+            if jid_.Server == "lid"
+            else await bot.client.get_lid_from_pn(jid_)
+        )
+    except Exception:
+        return
+    if not alt or not alt.User:
+        return
+    # The mapping holds both ways
+    alt_jid_cache.set(_key(alt), jid_)
+    return alt
+
+
+async def get_alt_jid(jid_: JID) -> JID | None:
+    """Returns the LID of a phone number JID or vice versa."""
+    return await alt_jid_cache.fetch(_key(jid_), _lookup_alt_jid, jid_)
+
+
+async def _lookup_contact(jid_: JID):
+    info = await bot.client.contact.get_contact(jid_)
+    if not info.Found and (alt := await get_alt_jid(jid_)):
+        try:
+            info = await bot.client.contact.get_contact(alt)
+        except Exception:
+            pass
+    return info
+
+
+async def get_contact_info(jid_: JID):
+    return await contact_cache.fetch(_key(jid_), _lookup_contact, jid_)
+
+
+async def _lookup_on_wa(number: str) -> bool:
+    response = await bot.client.is_on_whatsapp(number)
+    return response[0].IsIn
+
+
+async def is_on_wa(number: str) -> bool:
+    return await on_wa_cache.fetch(number, _lookup_on_wa, number)
+
+
+def _to_tg_entity(entity) -> TGEntity:
+    if isinstance(entity, User):
+        return TGEntity(
+            entity.id, True, entity.first_name, entity.last_name, entity.username
+        )
+    return TGEntity(
+        entity.id,
+        False,
+        username=getattr(entity, "username", None),
+        title=getattr(entity, "title", None),
+    )
+
+
+def remember_tg_entity(entity):
+    """Caches an entity Telethon already has, e.g. a message's sender."""
+    if entity is None:
+        return
+    tg_entity_cache.set(get_peer_id(entity), _to_tg_entity(entity))
+
+
+async def _lookup_tg_entity(client: TelegramClient, peer_id: int) -> TGEntity | None:
+    try:
+        return _to_tg_entity(await client.get_entity(peer_id))
+    except ValueError:
+        # Not a peer this client has met
+        return
+
+
+async def get_tg_entity(client: TelegramClient, peer_id: int) -> TGEntity | None:
+    return await tg_entity_cache.fetch(peer_id, _lookup_tg_entity, client, peer_id)
+
+
+def load_identity_cache():
+    if not file_exists(identity_cache_file):
+        return
+    try:
+        with open(identity_cache_file, "rb") as file:
+            saved = pickle.load(file)
+        for name, cache in identity_caches.items():
+            cache.load(saved.get(name, {}))
+    except Exception:
+        log(Exception)
+
+
+def save_identity_cache():
+    if conf.IDENTITY_CACHE_SIZE <= 0:
+        return
+    with open(identity_cache_file, "wb") as file:
+        pickle.dump(
+            {name: cache.dump() for name, cache in identity_caches.items()}, file
+        )
+
+
+async def auto_save_identity_cache():
+    while True:
+        await asyncio.sleep(IDENTITY_SAVE_INTERVAL)
+        try:
+            save_identity_cache()
+        except Exception:
+            await logger(Exception)
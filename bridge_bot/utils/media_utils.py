@@ -1,28 +1,70 @@
 import asyncio
+import hashlib
+import json
+import os
+import time
 import uuid
+from dataclasses import dataclass
 from os import cpu_count
+from pathlib import Path
 
 from neonize.utils.ffmpeg import AFFmpeg
 from neonize.utils.sticker import add_exif
 
-from bridge_bot.config import bot
+from bridge_bot.config import bot, conf
 
-from .bot_utils import read_binary, write_binary
+from .bot_utils import get_sticker_pack_title, read_binary, write_binary
 from .log_utils import log, logger
-from .os_utils import enshell, file_exists, s_remove, size_of
+from .os_utils import enshell, file_exists, s_remove, size_of, size_of_dir, touch
+from .webp_utils import set_webp_exif
 
+# Streams WhatsApp plays without conversion
+WA_VIDEO_CODECS = {"h264"}
+WA_PIX_FMTS = {"yuv420p", "yuvj420p"}
+WA_AUDIO_CODECS = {"aac"}
 
-async def all_vid_streams_avc(file_path):
+# Rough encode seconds per second of 1080p video for each x264 preset,
+# refined from finished transcodes & used to estimate time saved.
+encode_rates = {"slow": 1.5, "medium": 0.8, "fast": 0.5, "veryfast": 0.3}
+
+# Bigger videos are only accepted as documents
+WA_VIDEO_LIMIT = 100000000
+FIT_AUDIO_BITRATE = 128  # kbps
+# Below this the picture isn't worth keeping over sending a document
+FIT_MIN_VIDEO_BITRATE = 150  # kbps
+
+
+@dataclass
+class VideoPlan:
+    """
+    mode is one of:
+    none - already playable, send as is
+    copy - remux the streams into mp4 with +faststart
+    audio - copy video, re-encode audio to aac
+    full - re-encode everything with preset
+    fit - two-pass re-encode at bitrate (kbps) to get under WA_VIDEO_LIMIT
+    """
+
+    mode: str
+    preset: str = "slow"
+    duration: float = 0.0
+    # Duration scaled to 1080p; how much encoding a full transcode means
+    work: float = 0.0
+    reason: str = ""
+    bitrate: int = 0
+
+
+async def probe_media(file_path: str) -> dict:
+    """Container & stream details of a media file in one ffprobe run"""
     cmd = [
         "ffprobe",
         "-v",
         "error",
-        "-select_streams",
-        "v",
         "-show_entries",
-        "stream=codec_name",
+        "format=format_name,duration,bit_rate:"
+        "stream=codec_type,codec_name,pix_fmt,width,height,bit_rate",
         "-of",
-        "csv=p=0",
+        "json",
         file_path,
     ]
     process, stdout, stderr = await enshell(cmd)
@@ -31,15 +73,102 @@ async def all_vid_streams_avc(file_path):
             # type: ignore
             f"stderr: {stderr} Return code: {process.returncode}"
         )
-    output = stdout.strip()
-    codecs = output.split("\n")
-    return all(codec == "h264" for codec in codecs)  # For mis-mapped videos
+    return json.loads(stdout)
 
 
-async def convert_to_avc(input_path: str, output_path: str):
+def choose_preset(work: float) -> str:
+    """Faster presets for longer/larger videos so they don't hog a worker"""
+    if work <= 60:
+        return "slow"
+    if work <= 300:
+        return "medium"
+    if work <= 1200:
+        return "fast"
+    return "veryfast"
+
+
+def plan_video(probe: dict) -> VideoPlan:
+    """Picks the cheapest conversion that makes a video playable on WhatsApp"""
+    fmt = probe.get("format", {})
+    streams = probe.get("streams", [])
+    video = [s for s in streams if s.get("codec_type") == "video"]
+    audio = [s for s in streams if s.get("codec_type") == "audio"]
+    duration = float(fmt.get("duration") or 0)
+    pixels = max((s.get("width", 0) * s.get("height", 0) for s in video), default=0)
+    work = duration * (pixels or 1920 * 1080) / (1920 * 1080)
+
+    bad_video = {
+        f"{s.get('codec_name')}/{s.get('pix_fmt')}"
+        for s in video
+        if s.get("codec_name") not in WA_VIDEO_CODECS
+        or s.get("pix_fmt") not in WA_PIX_FMTS
+    }
+    if bad_video:
+        return VideoPlan(
+            "full",
+            choose_preset(work),
+            duration,
+            work,
+            f"video: {', '.join(bad_video)}",
+        )
+    bad_audio = {
+        s.get("codec_name") for s in audio if s.get("codec_name") not in WA_AUDIO_CODECS
+    }
+    if bad_audio:
+        return VideoPlan(
+            "audio",
+            duration=duration,
+            work=work,
+            reason=f"audio: {', '.join(bad_audio)}",
+        )
+    container = fmt.get("format_name", "")
+    if "mp4" not in container.split(","):
+        return VideoPlan(
+            "copy", duration=duration, work=work, reason=f"container: {container}"
+        )
+    return VideoPlan("none", duration=duration, work=work)
+
+
+def plan_fit(probe: dict, limit: int = WA_VIDEO_LIMIT) -> VideoPlan | None:
+    """
+    Plans an encode whose output lands under limit bytes,
+    None if the video is too long to fit at a watchable bitrate.
+    """
+    plan = plan_video(probe)
+    if not plan.duration:
+        return
+    # 5% headroom for the container & bitrate overshoot
+    total = int(limit * 8 * 0.95 / plan.duration / 1000)
+    bitrate = total - FIT_AUDIO_BITRATE
+    if bitrate < FIT_MIN_VIDEO_BITRATE:
+        return
+    return VideoPlan(
+        "fit",
+        choose_preset(plan.work),
+        plan.duration,
+        plan.work,
+        f"over {limit // 1000000}MB",
+        bitrate,
+    )
+
+
+async def analyze_video(file_path: str) -> VideoPlan:
+    plan = plan_video(await probe_media(file_path))
+    if plan.mode == "none":
+        log(
+            e=f"{file_path}: already playable on WhatsApp, "
+            f"~{plan.work * encode_rates['slow']:.0f}s of transcoding saved"
+        )
+    return plan
+
+
+async def convert_to_avc(
+    input_path: str, output_path: str, threads: int = 0, preset: str = "slow"
+):
     """
     Convert video to AVC (H.264) with quality preservation
     using FFmpeg's CRF (Constant Rate Factor) encoding
+    threads limits the encoder's threads, 0 lets FFmpeg decide
     """
     cmd = [
         "ffmpeg",
@@ -50,7 +179,7 @@ async def convert_to_avc(input_path: str, output_path: str):
         "-crf",
         "25",  # Quality range (0-51, lower=better)
         "-preset",
-        "slow",  # Better compression efficiency
+        preset,  # slow: better compression efficiency
         "-tune",
         "film",  # Optimization for film content
         "-c:a",
@@ -61,6 +190,8 @@ async def convert_to_avc(input_path: str, output_path: str):
         "+faststart",  # Web optimization
         "-pix_fmt",
         "yuv420p",  # Widest compatibility
+        "-threads",
+        str(threads),
         "-y",  # Overwrite output
         output_path,
     ]
@@ -73,6 +204,105 @@ async def convert_to_avc(input_path: str, output_path: str):
         )
 
 
+async def remux_video(
+    input_path: str, output_path: str, reencode_audio: bool = False, threads: int = 0
+):
+    """Rewraps video streams in mp4 without re-encoding them"""
+    cmd = [
+        "ffmpeg",
+        "-i",
+        input_path,
+        "-c:v",
+        "copy",
+        "-c:a",
+        *(("aac", "-b:a", "192k") if reencode_audio else ("copy",)),
+        # Subtitle & data streams rarely fit in mp4
+        "-sn",
+        "-dn",
+        "-movflags",
+        "+faststart",
+        "-threads",
+        str(threads),
+        "-y",
+        output_path,
+    ]
+
+    process, stdout, stderr = await enshell(cmd)
+    if process.returncode != 0:
+        raise RuntimeError(
+            # type: ignore
+            f"stderr: {stderr} Return code: {process.returncode}"
+        )
+
+
+async def fit_to_bitrate(
+    input_path: str, output_path: str, plan: VideoPlan, threads: int = 0
+):
+    """Two-pass H.264 encode, so the output size follows plan.bitrate closely"""
+    passlog = f"temp/{uuid.uuid4()}"
+    common = [
+        "-c:v",
+        "libx264",
+        "-b:v",
+        f"{plan.bitrate}k",
+        "-preset",
+        plan.preset,
+        "-pix_fmt",
+        "yuv420p",
+        "-threads",
+        str(threads),
+        "-passlogfile",
+        passlog,
+    ]
+    try:
+        for cmd in (
+            ["ffmpeg", "-i", input_path, *common, "-pass", "1", "-an"]
+            + ["-f", "mp4", "-y", os.devnull],
+            ["ffmpeg", "-i", input_path, *common, "-pass", "2"]
+            + ["-c:a", "aac", "-b:a", f"{FIT_AUDIO_BITRATE}k"]
+            + ["-sn", "-dn", "-movflags", "+faststart", "-y", output_path],
+        ):
+            process, stdout, stderr = await enshell(cmd)
+            if process.returncode != 0:
+                raise RuntimeError(
+                    # type: ignore
+                    f"stderr: {stderr} Return code: {process.returncode}"
+                )
+    finally:
+        s_remove(f"{passlog}-0.log", f"{passlog}-0.log.mbtree")
+
+
+async def convert_video(
+    input_path: str, output_path: str, plan: VideoPlan, threads: int = 0
+):
+    """Runs a VideoPlan & logs what it chose and roughly how long it saved"""
+    start = time.perf_counter()
+    if plan.mode == "full":
+        await convert_to_avc(input_path, output_path, threads, plan.preset)
+    elif plan.mode == "fit":
+        await fit_to_bitrate(input_path, output_path, plan, threads)
+    else:
+        await remux_video(input_path, output_path, plan.mode == "audio", threads)
+    elapsed = time.perf_counter() - start
+
+    if plan.mode == "fit":
+        log(
+            e=f"{input_path}: fit ({plan.preset}, {plan.bitrate}kbps) "
+            f"because {plan.reason}, took {elapsed:.1f}s"
+        )
+        return
+    if plan.mode == "full" and plan.work:
+        # Moving average so estimates follow the machine's actual speed
+        rate = elapsed / plan.work
+        encode_rates[plan.preset] = encode_rates[plan.preset] * 0.8 + rate * 0.2
+    baseline = plan.work * encode_rates["slow"]
+    decision = plan.mode + (f" ({plan.preset})" if plan.mode == "full" else "")
+    log(
+        e=f"{input_path}: {decision} because {plan.reason}, took {elapsed:.1f}s, "
+        f"~{max(baseline - elapsed, 0):.0f}s saved over a full slow transcode"
+    )
+
+
 async def is_mp3_audio(file_path: str) -> bool:
     """
     Check if an audio file is MP3 encoded using FFprobe
@@ -104,7 +334,73 @@ async def is_mp3_audio(file_path: str) -> bool:
 
 vstick_sem = asyncio.Semaphore(20)
 astick_sem = asyncio.Semaphore(10)
-exif_sem = asyncio.Semaphore(50)
+
+
+# Converted stickers, named by Telegram document id & pack title
+STICKER_CACHE_DIR = Path("downloads/stickers")
+_sticker_cache_size = None
+_stickers_in_flight = {}
+
+
+def _evict_stickers(added: int):
+    """Drops least recently sent stickers once the cache outgrows its size"""
+    global _sticker_cache_size
+    if _sticker_cache_size is None:
+        _sticker_cache_size = size_of_dir(STICKER_CACHE_DIR)
+    else:
+        _sticker_cache_size += added
+    if _sticker_cache_size <= conf.STICKER_CACHE_SIZE:
+        return
+    stickers = sorted(
+        (f.stat().st_mtime, f.stat().st_size, f)
+        for f in STICKER_CACHE_DIR.glob("*.webp")
+    )
+    for _, size, file in stickers:
+        if _sticker_cache_size <= conf.STICKER_CACHE_SIZE * 0.9:
+            break
+        s_remove(file)
+        _sticker_cache_size -= size
+
+
+async def get_wa_sticker(event) -> bytes:
+    """
+    WhatsApp-ready webp of a Telegram sticker; stickers sent before are
+    served from disk without downloading or converting them again.
+    """
+    try:
+        packname = await get_sticker_pack_title(event)
+    except Exception as e:
+        await logger(e=e, warning=True)
+        packname = "None"
+    if conf.STICKER_CACHE_SIZE <= 0:
+        sticker = await event.download_media(file=bytes)
+        return await convert_to_wa_sticker(sticker, event.file.name, packname)
+    title_hash = hashlib.blake2b(packname.encode(), digest_size=6).hexdigest()
+    cached = STICKER_CACHE_DIR / f"{event.file.media.id}-{title_hash}.webp"
+    if file_exists(cached):
+        touch(cached)
+        return await read_binary(cached)
+    # The same sticker sent to several chats at once is converted only once
+    if (task := _stickers_in_flight.get(cached)) is None:
+        task = asyncio.ensure_future(_cache_wa_sticker(event, packname, cached))
+        _stickers_in_flight[cached] = task
+        task.add_done_callback(lambda _: _stickers_in_flight.pop(cached, None))
+    return await asyncio.shield(task)
+
+
+async def _cache_wa_sticker(event, packname: str, cached: Path) -> bytes:
+    sticker = await event.download_media(file=bytes)
+    sticker = await convert_to_wa_sticker(sticker, event.file.name, packname)
+    STICKER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Written aside then renamed, so a crash never leaves a truncated sticker
+    temp = cached.with_name(f"{cached.name}.{uuid.uuid4().hex}.part")
+    try:
+        await write_binary(temp, sticker)
+        os.replace(temp, cached)
+    finally:
+        s_remove(temp)
+    _evict_stickers(len(sticker))
+    return sticker
 
 
 async def convert_to_wa_sticker(sticker, file_name, packname, return_type=False):
@@ -224,26 +520,9 @@ async def _tgs_to_webp(sticker, packname):
 
 
 async def add_sticker_exif(sticker: str | bytes, packname="Test!"):
-    base = f"temp/{uuid.uuid4()}"
-    exif_file = base + "_exif"
-    temp_file = base + ".webp"
-    await write_binary(exif_file, add_exif(packname, bot.client.me.PushName))
-    async with AFFmpeg(sticker) as ffmpeg:
-        cmd = [
-            "webpmux",
-            "-set",
-            "exif",
-            exif_file,
-            ffmpeg.filepath,
-            "-o",
-            temp_file,
-        ]
-        async with exif_sem:
-            await ffmpeg.call(cmd)
-    s_remove(exif_file)
-    buf = await read_binary(temp_file)
-    s_remove(temp_file)
-    return buf
+    if isinstance(sticker, str):
+        sticker = await read_binary(sticker)
+    return set_webp_exif(sticker, add_exif(packname, bot.client.me.PushName))
 
 
 async def get_video_thumbnail(file, with_dur=False):
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os import cpu_count
+
+from media_jobs import MediaJob, report_worker
+
+from bridge_bot import conf
+from bridge_bot.others.exceptions import MediaJobTimeout
+
+from .log_utils import log
+
+_CORES = cpu_count() or 1
+MEDIA_POOL_SIZE = max(1, min(conf.MEDIA_WORKERS or _CORES, _CORES))
+
+# Workers start from a fresh interpreter that only imports media_jobs;
+# forking would copy the Go runtime & threads of the running clients.
+_context = multiprocessing.get_context("spawn")
+
+
+class MediaPool(ProcessPoolExecutor):
+    """A process pool that can stop a worker stuck on a job"""
+
+    def __init__(self, max_workers: int):
+        self.worker_pids = set()
+        self._started = _context.SimpleQueue()
+        super().__init__(
+            max_workers,
+            mp_context=_context,
+            initializer=report_worker,
+            initargs=(self._started,),
+        )
+
+    def kill(self):
+        """
+        Ends every worker; exiting the pool doesn't stop a running job.
+        Other jobs on it fail with BrokenProcessPool and are retried.
+        """
+        while not self._started.empty():
+            self.worker_pids.add(self._started.get())
+        for pid in self.worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+
+
+def _get_pool() -> MediaPool:
+    global _pool
+    if _pool is None:
+        _pool = MediaPool(MEDIA_POOL_SIZE)
+    return _pool
+
+
+def _forget_pool(pool: MediaPool):
+    global _pool
+    if _pool is pool:
+        _pool = None
+
+
+def _kill_pool(pool: MediaPool):
+    """Stops a pool whose worker is stuck on a job that timed out"""
+    _forget_pool(pool)
+    pool.kill()
+
+
+async def run_media_job(job: MediaJob, timeout: int | None = None):
+    """
+    Runs job in the media worker pool and returns its result.
+    Raises MediaJobTimeout if it takes longer than timeout
+    (job.timeout, else MEDIA_JOB_TIMEOUT) seconds.
+    """
+    timeout = timeout or job.timeout or conf.MEDIA_JOB_TIMEOUT
+    loop = asyncio.get_running_loop()
+    for retry in (False, True):
+        pool = _get_pool()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(pool, job.run), timeout or None
+            )
+        except asyncio.TimeoutError:
+            _kill_pool(pool)
+            raise MediaJobTimeout(
+                f"{type(job).__name__} took longer than {timeout}s"
+            ) from None
+        except BrokenProcessPool:
+            _forget_pool(pool)
+            if retry:
+                raise
+            log(e=f"Media worker died while running {type(job).__name__}, retrying")
+
+
+def shutdown_media_worker():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,41 @@
-from sqlalchemy import Index, Integer, LargeBinary, String, and_, or_, select
+import asyncio
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from sqlalchemy import (
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    and_,
+    bindparam,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
-from bridge_bot.config import bot
+from bridge_bot.config import bot, conf
+
+from .cache_utils import LRUCache
+from .log_utils import logger
+from .proto_utils import (
+    intern_jid,
+    interned_jids,
+    pack_raw,
+    strip_message,
+    train_dict,
+    unpack_raw,
+)
 
 
 class Base(DeclarativeBase):
@@ -56,12 +89,357 @@ class Reaction(Base):
         )
 
 
+class SharedBase(DeclarativeBase):
+    pass
+
+
+class SharedMessage(SharedBase):
+    """Message for the single-database store, partitioned by gc_id"""
+
+    __tablename__ = "Bridged_Message"
+    __table_args__ = (
+        Index("gc_tg_idx_id", "gc_id", "chat_id", "tg_id"),
+        Index("gc_wa_idx_id", "gc_id", "chat_id", "wa_id"),
+    )
+    _id: Mapped[int] = mapped_column(primary_key=True)
+    gc_id: Mapped[str] = mapped_column(String(40))
+    chat_id: Mapped[int] = mapped_column(Integer)
+    tg_id: Mapped[int] = mapped_column(Integer)
+    wa_id: Mapped[str] = mapped_column(String(30))
+    raw: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_user: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    timestamp: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"Message(_id={self._id!r}, "
+            f"gc_id={self.gc_id!r}, "
+            f"chat_id={self.chat_id!r}, "
+            f"tg_id={self.tg_id!r}, "
+            f"wa_id={self.wa_id!r}, "
+        )
+
+
+class SharedReaction(SharedBase):
+    """Reaction for the single-database store, partitioned by gc_id"""
+
+    __tablename__ = "Bridged_Reaction"
+    __table_args__ = (
+        Index("gc_tgr_idx_id", "gc_id", "chat_id", "tg_id"),
+        Index("gc_war_idx_id", "gc_id", "chat_id", "wa_id"),
+    )
+    _id: Mapped[int] = mapped_column(primary_key=True)
+    gc_id: Mapped[str] = mapped_column(String(40))
+    chat_id: Mapped[int] = mapped_column(Integer)
+    tg_id: Mapped[int] = mapped_column(Integer)
+    wa_id: Mapped[str] = mapped_column(String(30))
+    raw: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    raw_user: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    timestamp: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"Reaction(_id={self._id!r}, "
+            f"gc_id={self.gc_id!r}, "
+            f"chat_id={self.chat_id!r}, "
+            f"tg_id={self.tg_id!r}, "
+            f"wa_id={self.wa_id!r}, "
+        )
+
+
+class AuxBase(DeclarativeBase):
+    """Bookkeeping tables present in every message database file"""
+
+
+class InternedJID(AuxBase):
+    """Sender JIDs referenced by compacted raw_user columns"""
+
+    __tablename__ = "Interned_JID"
+    key: Mapped[bytes] = mapped_column(LargeBinary(8), primary_key=True)
+    raw: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class StoreInfo(AuxBase):
+    __tablename__ = "Store_Info"
+    key: Mapped[str] = mapped_column(String(40), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, nullable=True)
+
+
+shared_db = "messages"
+PRUNE_BATCH = 500
 engines = {}
 sessions = {}
+# Groups allowed to (lazily) open a database & when they were last used
+registered_dbs = set()
+last_used = {}
+# Operations running on a group's database; idle ones are only reaped at 0
+users = {}
+schema_ready = set()
+# Intern keys already persisted, per database file
+interned_in = {}
+open_lock = asyncio.Lock()
+# Hot lookups are served from here; SQLite is only hit on a miss.
+msg_cache = LRUCache(conf.MSG_CACHE_SIZE)
 
 
-async def initialize_session(gc_id):
-    if gc_id in sessions:
+@contextmanager
+def _using(gc_id):
+    """Keeps gc_id's engine from being reaped until the block is done."""
+    users[gc_id] = users.get(gc_id, 0) + 1
+    try:
+        yield
+    finally:
+        last_used[gc_id] = time.monotonic()
+        users[gc_id] -= 1
+        if not users[gc_id]:
+            del users[gc_id]
+
+
+def _uses_db(func):
+    """_using() around a coroutine function taking gc_id first"""
+
+    @wraps(func)
+    async def wrapper(gc_id, *args, **kwargs):
+        with _using(gc_id):
+            return await func(gc_id, *args, **kwargs)
+
+    return wrapper
+
+
+def _cache_keys(gc_id, chat_id, tg_id=None, wa_id=None, is_reaction=False):
+    keys = []
+    if tg_id:
+        keys.append((gc_id, chat_id, tg_id, is_reaction))
+    if wa_id:
+        keys.append((gc_id, chat_id, wa_id, is_reaction))
+    return keys
+
+
+def cache_message(gc_id, msg, is_reaction=False, replace=False):
+    """
+    Fill the lookup cache with a stored row under both its tg & wa keys.
+    Existing entries are kept unless replace is set, to match get_message
+    returning the oldest row when ids collide.
+    """
+    for key in _cache_keys(gc_id, msg.chat_id, msg.tg_id, msg.wa_id, is_reaction):
+        if replace:
+            msg_cache.set(key, msg)
+        else:
+            msg_cache.setdefault(key, msg)
+
+
+def uncache_message(gc_id, msg, is_reaction=False):
+    for key in _cache_keys(gc_id, msg.chat_id, msg.tg_id, msg.wa_id, is_reaction):
+        msg_cache.pop(key)
+
+
+def uncache_group(gc_id):
+    for key in msg_cache.keys():
+        if key[0] == gc_id:
+            msg_cache.pop(key)
+
+
+def get_cache_stats() -> dict:
+    return msg_cache.stats()
+
+
+# Write-behind: rows waiting to be persisted, per group.
+write_queues = {}
+write_batches = {}
+write_locks = {}
+flushers = {}
+# Queued rows by cache key so reads never miss an unflushed write.
+pending_writes = {}
+
+
+def _queue_message(gc_id, msg, is_reaction):
+    if gc_id not in write_queues:
+        write_queues[gc_id] = asyncio.Queue()
+        write_batches[gc_id] = []
+        write_locks[gc_id] = asyncio.Lock()
+    for key in _cache_keys(gc_id, msg.chat_id, msg.tg_id, msg.wa_id, is_reaction):
+        pending_writes.setdefault(key, msg)
+    write_queues[gc_id].put_nowait((msg, is_reaction))
+    if not (task := flushers.get(gc_id)) or task.done():
+        flushers[gc_id] = asyncio.create_task(_flusher(gc_id))
+
+
+async def _flusher(gc_id):
+    """Flushes a group's queue every MSG_FLUSH_SIZE rows or MSG_FLUSH_INTERVAL secs"""
+    loop = asyncio.get_running_loop()
+    queue = write_queues[gc_id]
+    batch = write_batches[gc_id]
+    while True:
+        batch.append(await queue.get())
+        deadline = loop.time() + conf.MSG_FLUSH_INTERVAL
+        while len(batch) + queue.qsize() < conf.MSG_FLUSH_SIZE:
+            if (timeout := deadline - loop.time()) <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await flush_writes(gc_id)
+        except Exception:
+            await logger(Exception)
+            await asyncio.sleep(conf.MSG_FLUSH_INTERVAL)
+
+
+@_uses_db
+async def flush_writes(gc_id):
+    """Persist every queued row for gc_id in a single transaction."""
+    if gc_id not in write_queues:
+        return
+    queue = write_queues[gc_id]
+    batch = write_batches[gc_id]
+    async with write_locks[gc_id]:
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        if not batch:
+            return
+        rows = batch[:]
+        batch.clear()
+        try:
+            if _use_core():
+                await _core_insert(gc_id, rows)
+            else:
+                async with (await get_session(gc_id))() as session:
+                    async with session.begin():
+                        session.add_all([msg for msg, _ in rows])
+        except BaseException:
+            # Keep them queued for the next attempt
+            batch[:0] = rows
+            raise
+    for msg, is_reaction in rows:
+        for key in _cache_keys(gc_id, msg.chat_id, msg.tg_id, msg.wa_id, is_reaction):
+            if pending_writes.get(key) is msg:
+                pending_writes.pop(key)
+
+
+async def flush_all_writes():
+    for gc_id in list(write_queues):
+        try:
+            await flush_writes(gc_id)
+        except Exception:
+            await logger(Exception)
+
+
+async def _stop_writer(gc_id) -> bool:
+    """
+    Flushes & stops a group's write-behind queue.
+    If the final flush fails the rows stay queued (and keep being retried)
+    and False is returned.
+    """
+    # Rows queued during the flush restart the flusher; go again for those
+    while gc_id in flushers:
+        task = flushers.pop(gc_id)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await flush_writes(gc_id)
+        except Exception:
+            await logger(Exception)
+            unsaved = len(write_batches[gc_id]) + write_queues[gc_id].qsize()
+            await logger(
+                e=f"Kept {unsaved} unsaved message record(s) of {gc_id} queued",
+                warning=True,
+            )
+            flushers[gc_id] = asyncio.create_task(_flusher(gc_id))
+            return False
+    write_queues.pop(gc_id, None)
+    write_batches.pop(gc_id, None)
+    write_locks.pop(gc_id, None)
+    return True
+
+
+def _get_model(is_reaction=False):
+    if conf.SINGLE_MSG_DB:
+        return SharedMessage if not is_reaction else SharedReaction
+    return Message if not is_reaction else Reaction
+
+
+def _in_chat(message, gc_id, chat_id):
+    if conf.SINGLE_MSG_DB:
+        return and_(message.gc_id == gc_id, message.chat_id == chat_id)
+    return message.chat_id == chat_id
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # Must precede anything that initialises a new file
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+async def _create_schema(engine, db_name, base):
+    # create_all only needs to run once per file per process
+    if db_name in schema_ready:
+        return
+    async with engine.begin() as conn:
+        # Only takes effect on new files; compact_store converts old ones
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.run_sync(base.metadata.create_all)
+        await conn.run_sync(AuxBase.metadata.create_all)
+        rows = (await conn.execute(select(InternedJID.__table__))).all()
+    interned_jids.update((row.key, row.raw) for row in rows)
+    interned_in.setdefault(db_name, set()).update(row.key for row in rows)
+    schema_ready.add(db_name)
+
+
+def _db_name(gc_id):
+    return shared_db if conf.SINGLE_MSG_DB else gc_id
+
+
+async def _compact(gc_id, raw, raw_user):
+    """Encodes raw & raw_user in the compact storage format."""
+    if raw:
+        raw = pack_raw(raw)
+    if raw_user:
+        raw_user, key = intern_jid(raw_user)
+        stored = interned_in.setdefault(_db_name(gc_id), set())
+        if key not in stored:
+            engine = await _get_engine(gc_id)
+            async with engine.begin() as conn:
+                await conn.execute(
+                    insert(InternedJID).prefix_with("OR IGNORE"),
+                    {"key": key, "raw": interned_jids[key]},
+                )
+            stored.add(key)
+    return raw, raw_user
+
+
+async def _initialize_shared_session():
+    if shared_db in engines:
+        return
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///chat_dbs/{shared_db}.db",
+        pool_size=4,
+        max_overflow=4,
+        pool_timeout=30,
+        connect_args={"timeout": 10},
+    )
+    event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    engines[shared_db] = engine
+    sessions[shared_db] = async_sessionmaker(engine, expire_on_commit=False)
+    await _create_schema(engine, shared_db, SharedBase)
+
+    print(f"initialized database: {shared_db}.db")
+
+
+async def _open_session(gc_id):
+    if conf.SINGLE_MSG_DB:
+        await _initialize_shared_session()
+        # Every group shares the one engine & pool
+        engines[gc_id] = engines[shared_db]
+        sessions[gc_id] = sessions[shared_db]
         return
     engine = create_async_engine(
         f"sqlite+aiosqlite:///chat_dbs/{gc_id}.db",
@@ -72,28 +450,375 @@ async def initialize_session(gc_id):
     )
     engines[gc_id] = engine
     sessions[gc_id] = async_sessionmaker(engine, expire_on_commit=False)
+    await _create_schema(engine, gc_id, Base)
+
+    print(f"initialized database: {gc_id}.db")
+
+
+async def get_session(gc_id):
+    """
+    Returns the sessionmaker for a registered group,
+    opening its engine on first access.
+    """
+    if gc_id not in registered_dbs:
+        raise KeyError(gc_id)
+    last_used[gc_id] = time.monotonic()
+    if gc_id not in sessions:
+        async with open_lock:
+            if gc_id not in sessions:
+                await _open_session(gc_id)
+    return sessions[gc_id]
 
+
+async def initialize_session(gc_id):
+    """Registers a group; its database is only opened once it's used."""
+    registered_dbs.add(gc_id)
+
+
+async def import_group_dbs() -> dict:
+    """
+    Copies every per-group chat_dbs/{gc_id}.db into the single-database store.
+    Imported files are renamed to {gc_id}.db.imported so re-runs skip them.
+    Returns {gc_id: number_of_rows_imported}
+    """
+    if not conf.SINGLE_MSG_DB:
+        raise RuntimeError("SINGLE_MSG_DB must be enabled to import group databases")
+    await _initialize_shared_session()
+    shared_engine = engines[shared_db]
+    imported = {}
+    for db_file in sorted(Path("chat_dbs").glob("*.db")):
+        gc_id = db_file.stem
+        if gc_id == shared_db:
+            continue
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_file}")
+        count = 0
+        try:
+            async with engine.connect() as src, shared_engine.begin() as dest:
+                tables = await src.run_sync(
+                    lambda conn: inspect(conn).get_table_names()
+                )
+                # Compacted rows point into the file's own Interned_JID table
+                jids = []
+                for aux in (InternedJID, StoreInfo):
+                    if aux.__tablename__ not in tables:
+                        continue
+                    rows = (await src.execute(select(aux.__table__))).all()
+                    if not rows:
+                        continue
+                    values = [dict(row._mapping) for row in rows]
+                    await dest.execute(insert(aux).prefix_with("OR IGNORE"), values)
+                    if aux is InternedJID:
+                        jids = values
+                for old, new in ((Message, SharedMessage), (Reaction, SharedReaction)):
+                    if old.__tablename__ not in tables:
+                        continue
+                    result = await src.stream(
+                        select(old.__table__).execution_options(yield_per=1000)
+                    )
+                    async for rows in result.partitions():
+                        values = []
+                        for row in rows:
+                            row = dict(row._mapping)
+                            row.pop("_id")
+                            row["gc_id"] = gc_id
+                            values.append(row)
+                        await dest.execute(insert(new), values)
+                        count += len(values)
+        finally:
+            await engine.dispose()
+        interned_jids.update((row["key"], row["raw"]) for row in jids)
+        interned_in.setdefault(shared_db, set()).update(row["key"] for row in jids)
+        db_file.rename(f"{db_file}.imported")
+        uncache_group(gc_id)
+        imported[gc_id] = count
+    return imported
+
+
+async def _sample_raw(engine, table, limit) -> list:
+    async with engine.connect() as conn:
+        rows = await conn.execute(
+            select(table.c.raw)
+            .where(table.c.raw.is_not(None))
+            .order_by(table.c._id.desc())
+            .limit(limit)
+        )
+        return [strip_message(unpack_raw(row.raw)) for row in rows]
+
+
+async def _compact_table(engine, table, db_name) -> int:
+    stored = interned_in.setdefault(db_name, set())
+    stmt = (
+        update(table)
+        .where(table.c._id == bindparam("b_id"))
+        .values(raw=bindparam("b_raw"), raw_user=bindparam("b_raw_user"))
+    )
+    count = last_id = 0
+    while True:
+        async with engine.begin() as conn:
+            rows = (
+                await conn.execute(
+                    select(table.c._id, table.c.raw, table.c.raw_user)
+                    .where(table.c._id > last_id)
+                    .order_by(table.c._id)
+                    .limit(500)
+                )
+            ).all()
+            if not rows:
+                return count
+            values, new_jids = [], []
+            for row in rows:
+                raw, raw_user = unpack_raw(row.raw), unpack_raw(row.raw_user)
+                if raw:
+                    raw = pack_raw(raw)
+                if raw_user:
+                    raw_user, key = intern_jid(raw_user)
+                    if key not in stored:
+                        new_jids.append({"key": key, "raw": interned_jids[key]})
+                        stored.add(key)
+                values.append({"b_id": row._id, "b_raw": raw, "b_raw_user": raw_user})
+            if new_jids:
+                await conn.execute(
+                    insert(InternedJID).prefix_with("OR IGNORE"), new_jids
+                )
+            await conn.execute(stmt, values)
+        count += len(rows)
+        last_id = rows[-1]._id
+
+
+async def compact_store() -> dict:
+    """
+    Rewrites every stored row in the compact format: stripped, zstd-compressed
+    raw blobs (with a dictionary trained on the current data) & interned
+    raw_user JIDs, then VACUUMs each database.
+    Returns {db_name: (rows_rewritten, size_before, size_after)}
+    """
+    await flush_all_writes()
+    if conf.SINGLE_MSG_DB:
+        db_files = [Path(f"chat_dbs/{shared_db}.db")]
+    else:
+        db_files = sorted(
+            f for f in Path("chat_dbs").glob("*.db") if f.stem != shared_db
+        )
+    models = (_get_model(), _get_model(True))
+    db_engines = {
+        f: create_async_engine(f"sqlite+aiosqlite:///{f}", connect_args={"timeout": 30})
+        for f in db_files
+        if f.exists()
+    }
+    compacted = {}
+    try:
+        samples = []
+        for engine in db_engines.values():
+            async with engine.begin() as conn:
+                await conn.run_sync(AuxBase.metadata.create_all)
+            samples.extend(await _sample_raw(engine, models[0].__table__, 2000))
+        train_dict(samples)
+        for db_file, engine in db_engines.items():
+            size = db_file.stat().st_size
+            count = 0
+            for model in models:
+                count += await _compact_table(engine, model.__table__, db_file.stem)
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+                await conn.exec_driver_sql("VACUUM")
+            await _set_store_info(engine, "last_compaction", int(time.time()))
+            compacted[db_file.stem] = (count, size, db_file.stat().st_size)
+    finally:
+        for engine in db_engines.values():
+            await engine.dispose()
+    return compacted
+
+
+async def _set_store_info(engine, key, value):
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(StoreInfo).prefix_with("OR REPLACE"), {"key": key, "value": value}
+        )
 
-    print(f"initialized database: {gc_id}.db")
+
+async def _get_store_info(engine, key):
+    async with engine.connect() as conn:
+        return await conn.scalar(select(StoreInfo.value).where(StoreInfo.key == key))
+
+
+def get_retention(gc_id) -> (int, int):
+    """Returns (max_age_days, max_rows) for a group; 0 means unlimited"""
+    days, rows = bot.group_dict.get("msg_retention", {}).get(
+        gc_id, (conf.MSG_RETENTION_DAYS, conf.MSG_RETENTION_ROWS)
+    )
+    return days, rows
+
+
+def _older_than(column, cutoff):
+    # Timestamps may be stored in seconds or milliseconds
+    return or_(column < cutoff, and_(column >= 10**11, column < cutoff * 1000))
+
+
+async def _prune_table(engine, table, gc_id, days, rows) -> int:
+    scope = [table.c.gc_id == gc_id] if conf.SINGLE_MSG_DB else []
+    expired = []
+    if days:
+        expired.append(_older_than(table.c.timestamp, time.time() - days * 86400))
+    if rows:
+        async with engine.connect() as conn:
+            # Oldest row still within the limit
+            keep_from = await conn.scalar(
+                select(table.c._id)
+                .where(*scope)
+                .order_by(table.c._id.desc())
+                .offset(rows - 1)
+                .limit(1)
+            )
+        if keep_from:
+            expired.append(table.c._id < keep_from)
+    if not expired:
+        return 0
+    batch = (
+        select(table.c._id)
+        .where(*scope, or_(*expired))
+        .order_by(table.c._id)
+        .limit(PRUNE_BATCH)
+    )
+    count = 0
+    while True:
+        # Short transactions so bridging writes can slip in between
+        async with engine.begin() as conn:
+            result = await conn.execute(delete(table).where(table.c._id.in_(batch)))
+        count += result.rowcount
+        if result.rowcount < PRUNE_BATCH:
+            return count
+        await asyncio.sleep(0.1)
+
+
+async def _maintain_db(engine):
+    """Returns freed pages to the OS & refreshes planner statistics."""
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if await conn.scalar(text("PRAGMA auto_vacuum")) == 2:
+            driver_conn = (await conn.get_raw_connection()).driver_connection
+            while await conn.scalar(text("PRAGMA freelist_count")):
+                # Pages are only freed as the result rows are stepped through
+                cursor = await driver_conn.execute("PRAGMA incremental_vacuum(1000)")
+                await cursor.fetchall()
+                await asyncio.sleep(0.1)
+        await conn.exec_driver_sql("PRAGMA optimize")
+    await _set_store_info(engine, "last_compaction", int(time.time()))
+
+
+async def prune_message_stores() -> dict:
+    """
+    Deletes rows past each group's retention policy, then compacts the
+    affected databases. Returns {gc_id: rows_deleted}
+    """
+    pruned = {}
+    touched = {}
+    for gc_id in sorted(registered_dbs):
+        days, rows = get_retention(gc_id)
+        if not (days or rows):
+            continue
+        count = 0
+        with _using(gc_id):
+            engine = await _get_engine(gc_id)
+            for is_reaction in (False, True):
+                table = _get_model(is_reaction).__table__
+                count += await _prune_table(engine, table, gc_id, days, rows)
+        if count:
+            pruned[gc_id] = count
+            touched[_db_name(gc_id)] = gc_id
+            uncache_group(gc_id)
+    for gc_id in touched.values():
+        with _using(gc_id):
+            await _maintain_db(await _get_engine(gc_id))
+    return pruned
 
 
-async def deinitialize_session(gc_id: str) -> None:
-    """Clean up and remove session resources for a group chat ID"""
-    # Check if session exists
-    if gc_id not in sessions or gc_id not in engines:
+async def auto_prune_message_stores():
+    """Applies retention policies every MSG_PRUNE_INTERVAL seconds"""
+    if not conf.MSG_PRUNE_INTERVAL:
         return
+    while True:
+        await asyncio.sleep(conf.MSG_PRUNE_INTERVAL)
+        try:
+            if pruned := await prune_message_stores():
+                total = sum(pruned.values())
+                await logger(e=f"Pruned {total} bridged message records.")
+        except Exception:
+            await logger(Exception)
 
-    # Dispose engine and clean up resources
-    engine = engines[gc_id]
-    await engine.dispose()
 
-    # Remove references from dictionaries
-    del sessions[gc_id]
-    del engines[gc_id]
+@_uses_db
+async def _group_stats(gc_id) -> dict:
+    engine = await _get_engine(gc_id)
+    info = {}
+    for key, is_reaction in (("messages", False), ("reactions", True)):
+        table = _get_model(is_reaction).__table__
+        scope = [table.c.gc_id == gc_id] if conf.SINGLE_MSG_DB else []
+        async with engine.connect() as conn:
+            row = (
+                await conn.execute(
+                    select(
+                        func.count(),
+                        func.coalesce(
+                            func.sum(
+                                func.coalesce(func.length(table.c.raw), 0)
+                                + func.coalesce(func.length(table.c.raw_user), 0)
+                            ),
+                            0,
+                        ),
+                    ).where(*scope)
+                )
+            ).one()
+        info[key] = row[0]
+        info["data_size"] = info.get("data_size", 0) + row[1]
+    db_file = Path(f"chat_dbs/{_db_name(gc_id)}.db")
+    info["file_size"] = db_file.stat().st_size if db_file.exists() else 0
+    info["last_compaction"] = await _get_store_info(engine, "last_compaction")
+    return info
 
-    print(f"Cleaned up resources for database: {gc_id}.db")
+
+async def get_store_stats() -> dict:
+    """
+    Returns {gc_id: {"messages", "reactions", "data_size", "file_size",
+    "last_compaction"}} for every registered group
+    """
+    stats = {}
+    for gc_id in sorted(registered_dbs):
+        stats[gc_id] = await _group_stats(gc_id)
+    return stats
+
+
+async def deinitialize_session(gc_id: str, unregister: bool = True) -> None:
+    """
+    Clean up and remove session resources for a group chat ID
+    With unregister=False the group can still be reopened on next access,
+    and is left open if something is still using it
+    """
+    # Queued rows need the group registered to be written, so flush first
+    if not await _stop_writer(gc_id):
+        return
+    if unregister:
+        registered_dbs.discard(gc_id)
+        last_used.pop(gc_id, None)
+    # No awaits between the checks & removal, so get_session either
+    # returns the old engine before this or opens a new one after
+    async with open_lock:
+        if not unregister and gc_id in users:
+            return
+        # Check if session exists
+        if gc_id not in sessions or gc_id not in engines:
+            return
+        # Remove references from dictionaries
+        engine = engines.pop(gc_id)
+        del sessions[gc_id]
+
+    # Dispose engine and clean up resources
+    # (the shared engine stays up for the remaining groups)
+    if not conf.SINGLE_MSG_DB:
+        await engine.dispose()
+    uncache_group(gc_id)
+
+    print(f"Cleaned up resources for: {gc_id}")
 
 
 async def initialize_all_sessions():
@@ -104,25 +829,165 @@ async def initialize_all_sessions():
         await initialize_session(gc_id)
 
 
+async def reap_idle_sessions():
+    """Disposes engines of groups idle for longer than MSG_DB_IDLE_TIMEOUT"""
+    if not (timeout := conf.MSG_DB_IDLE_TIMEOUT) or conf.SINGLE_MSG_DB:
+        return
+    while True:
+        await asyncio.sleep(min(timeout / 2, 300))
+        now = time.monotonic()
+        for gc_id in list(engines):
+            if gc_id in users or now - last_used.get(gc_id, 0) < timeout:
+                continue
+            try:
+                await deinitialize_session(gc_id, unregister=False)
+            except Exception:
+                await logger(Exception)
+
+
+# Lean backend (MSG_STORE_BACKEND=core): one prepared Core statement per
+# operation, no unit-of-work, identity map or SELECT-then-mutate.
+core_statements = {}
+
+
+def _use_core():
+    return conf.MSG_STORE_BACKEND == "core"
+
+
+def _core_stmt(kind, is_reaction=False):
+    key = (kind, is_reaction, conf.SINGLE_MSG_DB)
+    if (stmt := core_statements.get(key)) is not None:
+        return stmt
+    table = _get_model(is_reaction).__table__
+    scope = [table.c.chat_id == bindparam("b_chat_id")]
+    if conf.SINGLE_MSG_DB:
+        scope.append(table.c.gc_id == bindparam("b_gc_id"))
+    by_tg = and_(*scope, table.c.tg_id == bindparam("b_tg_id"))
+    by_wa = and_(*scope, table.c.wa_id == bindparam("b_wa_id"))
+    first = select(table.c._id).where(or_(by_tg, by_wa)).limit(1).scalar_subquery()
+    if kind == "insert":
+        stmt = insert(table)
+    elif kind == "get_by_tg":
+        stmt = select(table).where(by_tg).limit(1)
+    elif kind == "get_by_wa":
+        stmt = select(table).where(by_wa).limit(1)
+    elif kind == "update":
+        stmt = update(table).where(table.c._id == first).returning(*table.c)
+    elif kind == "delete":
+        stmt = delete(table).where(table.c._id == first).returning(*table.c)
+    else:
+        raise ValueError(f"Unknown statement: {kind}")
+    core_statements[key] = stmt
+    return stmt
+
+
+def _core_params(gc_id, chat_id, tg_id=None, wa_id=None):
+    params = {"b_chat_id": chat_id, "b_tg_id": tg_id, "b_wa_id": wa_id}
+    if conf.SINGLE_MSG_DB:
+        params["b_gc_id"] = gc_id
+    return params
+
+
+def _row_values(msg) -> dict:
+    return {
+        column.key: getattr(msg, column.key)
+        for column in msg.__table__.c
+        if column.key != "_id"
+    }
+
+
+def _to_model(row, is_reaction=False):
+    # Detached instance so callers get the same type as the ORM path
+    return _get_model(is_reaction)(**row._mapping) if row else None
+
+
+async def _get_engine(gc_id):
+    await get_session(gc_id)
+    return engines[gc_id]
+
+
+async def _core_insert(gc_id, rows):
+    """Inserts [(msg, is_reaction), …] with one executemany per table"""
+    by_table = {}
+    for msg, is_reaction in rows:
+        by_table.setdefault(is_reaction, []).append(_row_values(msg))
+    engine = await _get_engine(gc_id)
+    async with engine.begin() as conn:
+        for is_reaction, values in by_table.items():
+            await conn.execute(_core_stmt("insert", is_reaction), values)
+
+
+async def _core_get(gc_id, chat_id, tg_id, wa_id, is_reaction):
+    stmt = _core_stmt("get_by_tg" if tg_id else "get_by_wa", is_reaction)
+    engine = await _get_engine(gc_id)
+    async with engine.connect() as conn:
+        row = (
+            await conn.execute(stmt, _core_params(gc_id, chat_id, tg_id, wa_id))
+        ).first()
+    return _to_model(row, is_reaction)
+
+
+async def _core_delete(gc_id, chat_id, tg_id, wa_id, is_reaction):
+    engine = await _get_engine(gc_id)
+    async with engine.begin() as conn:
+        row = (
+            await conn.execute(
+                _core_stmt("delete", is_reaction),
+                _core_params(gc_id, chat_id, tg_id, wa_id),
+            )
+        ).first()
+    return _to_model(row, is_reaction)
+
+
+async def _core_edit(gc_id, chat_id, update_data, tg_id, wa_id, is_reaction):
+    table = _get_model(is_reaction).__table__
+    for key in update_data:
+        if key not in table.c:
+            raise AttributeError(f"Invalid field: {key}")
+    stmt = _core_stmt("update", is_reaction).values(
+        {key: bindparam(f"new_{key}") for key in update_data}
+    )
+    params = _core_params(gc_id, chat_id, tg_id, wa_id)
+    params.update({f"new_{key}": value for key, value in update_data.items()})
+    engine = await _get_engine(gc_id)
+    async with engine.begin() as conn:
+        row = (await conn.execute(stmt, params)).first()
+    return _to_model(row, is_reaction)
+
+
+@_uses_db
 async def save_message(
     gc_id, chat_id, jid, msg, tg_id, wa_id, timestamp=None, is_reaction=False
 ):
-    async_session = sessions[gc_id]
-    message = Message if not is_reaction else Reaction
-    async with async_session() as session:
-        msg = message(
-            chat_id=chat_id,
-            tg_id=tg_id,
-            wa_id=wa_id,
-            raw=msg.SerializeToString() if msg else None,
-            raw_user=(jid or bot.client.me.JID).SerializeToString(),
-            timestamp=timestamp,
-        )
-        async with session.begin():
-            session.add(msg)
-        await session.commit()
+    async_session = await get_session(gc_id)
+    message = _get_model(is_reaction)
+    extra = {"gc_id": gc_id} if conf.SINGLE_MSG_DB else {}
+    raw = msg.SerializeToString() if msg else None
+    raw_user = (jid or bot.client.me.JID).SerializeToString()
+    if conf.COMPACT_MSG_STORE:
+        raw, raw_user = await _compact(gc_id, raw, raw_user)
+    msg = message(
+        **extra,
+        chat_id=chat_id,
+        tg_id=tg_id,
+        wa_id=wa_id,
+        raw=raw,
+        raw_user=raw_user,
+        timestamp=timestamp,
+    )
+    if conf.MSG_WRITE_BEHIND:
+        _queue_message(gc_id, msg, is_reaction)
+    elif _use_core():
+        await _core_insert(gc_id, [(msg, is_reaction)])
+    else:
+        async with async_session() as session:
+            async with session.begin():
+                session.add(msg)
+            await session.commit()
+    cache_message(gc_id, msg, is_reaction)
 
 
+@_uses_db
 async def get_message(
     gc_id: str,
     chat_id: int,
@@ -131,30 +996,43 @@ async def get_message(
     is_reaction: bool = False,
 ):
     try:
-        async_session = sessions[gc_id]
-        message = Message if not is_reaction else Reaction
+        keys = _cache_keys(gc_id, chat_id, tg_id, wa_id, is_reaction)
+        if keys and (cached := msg_cache.get(keys[0])) is not None:
+            return cached
+        if keys and (queued := pending_writes.get(keys[0])) is not None:
+            return queued
+        if _use_core():
+            result = await _core_get(gc_id, chat_id, tg_id, wa_id, is_reaction)
+            if result:
+                cache_message(gc_id, result, is_reaction)
+            return result
+        async_session = await get_session(gc_id)
+        message = _get_model(is_reaction)
         async with async_session() as session:
             stmt = (
                 select(message).where(
                     and_(
-                        message.chat_id.in_([chat_id]),
+                        _in_chat(message, gc_id, chat_id),
                         message.tg_id.in_([tg_id]),
                     )
                 )
                 if tg_id
                 else select(message).where(
                     and_(
-                        message.chat_id.in_([chat_id]),
+                        _in_chat(message, gc_id, chat_id),
                         message.wa_id.in_([wa_id]),
                     )
                 )
             )
-            results = (await session.scalars(stmt)).all()
-        return results[0] if results else None
+            result = (await session.scalars(stmt.limit(1))).first()
+        if result:
+            cache_message(gc_id, result, is_reaction)
+        return result
     except Exception as e:
         raise e
 
 
+@_uses_db
 async def delete_message(
     gc_id: str,
     chat_id: int,
@@ -171,13 +1049,20 @@ async def delete_message(
         if not tg_id and not wa_id:
             raise ValueError("Either tg_id or wa_id must be provided")
 
-        async_session = sessions[gc_id]
-        message = Message if not is_reaction else Reaction
+        async_session = await get_session(gc_id)
+        await flush_writes(gc_id)
+        if _use_core():
+            result = await _core_delete(gc_id, chat_id, tg_id, wa_id, is_reaction)
+            if not result:
+                return False
+            uncache_message(gc_id, result, is_reaction)
+            return True
+        message = _get_model(is_reaction)
         async with async_session() as session:
             # Build query with same conditions as get_message
             stmt = select(message).where(
                 and_(
-                    message.chat_id == chat_id,
+                    _in_chat(message, gc_id, chat_id),
                     or_(message.tg_id == tg_id, message.wa_id == wa_id),
                 )
             )
@@ -187,6 +1072,7 @@ async def delete_message(
             if result:
                 await session.delete(result)
                 await session.commit()
+                uncache_message(gc_id, result, is_reaction)
                 return True
             return False
 
@@ -197,6 +1083,53 @@ async def delete_message(
         raise e
 
 
+@_uses_db
+async def delete_messages(gc_id: str, chat_id: int, tg_ids: list) -> list:
+    """
+    Bulk delete_message for telegram ids, along with the reactions bridged
+    for them (on both ends), in a single transaction.
+    Returns the deleted messages in the order of tg_ids
+    """
+    if not tg_ids:
+        return []
+    await flush_writes(gc_id)
+    message = _get_model().__table__
+    reaction = _get_model(True).__table__
+    engine = await _get_engine(gc_id)
+    async with engine.begin() as conn:
+        found = {}
+        rows = await conn.execute(
+            select(message)
+            .where(_in_chat(message.c, gc_id, chat_id), message.c.tg_id.in_(tg_ids))
+            .order_by(message.c._id)
+        )
+        for row in rows:
+            # First match wins, like get_message
+            found.setdefault(row.tg_id, row)
+        if found:
+            await conn.execute(
+                delete(message).where(
+                    message.c._id.in_([row._id for row in found.values()])
+                )
+            )
+        wa_ids = [row.wa_id for row in found.values()]
+        reactions = await conn.execute(
+            delete(reaction)
+            .where(
+                _in_chat(reaction.c, gc_id, chat_id),
+                or_(reaction.c.tg_id.in_(tg_ids), reaction.c.wa_id.in_(wa_ids)),
+            )
+            .returning(reaction.c.chat_id, reaction.c.tg_id, reaction.c.wa_id)
+        )
+        for row in reactions:
+            uncache_message(gc_id, row, True)
+    deleted = [_to_model(found[tg_id]) for tg_id in tg_ids if tg_id in found]
+    for msg in deleted:
+        uncache_message(gc_id, msg)
+    return deleted
+
+
+@_uses_db
 async def edit_message(
     gc_id: str,
     chat_id: int,
@@ -217,15 +1150,37 @@ async def edit_message(
         if not update_data:
             raise ValueError("No update data provided")
 
-        async_session = sessions[gc_id]
-        message = Message if not is_reaction else Reaction
+        async_session = await get_session(gc_id)
+        await flush_writes(gc_id)
+        if conf.COMPACT_MSG_STORE and {"raw", "raw_user"} & update_data.keys():
+            update_data = dict(update_data)
+            raw, raw_user = await _compact(
+                gc_id, update_data.get("raw"), update_data.get("raw_user")
+            )
+            if "raw" in update_data:
+                update_data["raw"] = raw
+            if "raw_user" in update_data:
+                update_data["raw_user"] = raw_user
+        if _use_core():
+            if {"tg_id", "wa_id"} & update_data.keys() and (
+                old := await _core_get(gc_id, chat_id, tg_id, wa_id, is_reaction)
+            ):
+                # The old ids mustn't keep pointing at the edited row
+                uncache_message(gc_id, old, is_reaction)
+            message = await _core_edit(
+                gc_id, chat_id, update_data, tg_id, wa_id, is_reaction
+            )
+            if message:
+                cache_message(gc_id, message, is_reaction, replace=True)
+            return message
+        message = _get_model(is_reaction)
         async with async_session() as session:
             # Find message using same logic as get_message
             stmt = (
                 select(message)
                 .where(
                     and_(
-                        message.chat_id == chat_id,
+                        _in_chat(message, gc_id, chat_id),
                         or_(
                             message.tg_id == tg_id if tg_id else False,
                             message.wa_id == wa_id if wa_id else False,
@@ -239,6 +1194,8 @@ async def edit_message(
 
             if not message:
                 return
+            # The old ids mustn't keep pointing at the edited row
+            uncache_message(gc_id, message, is_reaction)
 
             # Apply updates
             for key, value in update_data.items():
@@ -248,7 +1205,8 @@ async def edit_message(
                     raise AttributeError(f"Invalid field: {key}")
 
             await session.commit()
-            return message
+        cache_message(gc_id, message, is_reaction, replace=True)
+        return message
 
     except Exception as e:
         if isinstance(e, KeyError):
@@ -15,6 +15,8 @@ from bridge_bot.fun.stuff import force_read_more
 from bridge_bot.others.exceptions import ArgumentParserError
 
 from .bot_utils import entities_has_spoiler
+from .identity_cache import get_alt_jid, get_contact_info, get_tg_entity, is_on_wa
+from .proto_utils import unpack_raw
 
 # isort: off
 from .events import (
@@ -34,6 +36,30 @@ def is_echo(sender):
         return True
 
 
+def tg_message_kind(event) -> str | None:
+    """
+    Sorts a new Telegram message into the kind of content the forwarders
+    handle, so each attribute is probed once per message.
+    """
+    media = event.media
+    if media is None:
+        return "text" if event.message.message else None
+    if isinstance(media, types.MessageMediaWebPage):
+        return "webpage"
+    if event.photo:
+        return "image"
+    if event.sticker:
+        return "sticker"
+    if event.gif:
+        return "gif"
+    if event.video or event.video_note:
+        return "video"
+    if event.audio or event.voice:
+        return "audio"
+    if event.document:
+        return "document"
+
+
 def user_is_admin(user: str, members: list):
     for member in members:
         if user == member.JID.User or user == member.PhoneNumber.User:
@@ -65,18 +91,7 @@ async def get_user_info(
     user_jid: JID | None = None,
 ):
     jid_ = user_jid or jid.build_jid(user_id, server)
-    info = await bot.client.contact.get_contact(jid_)
-    if not info.Found:
-        try:
-            jid_ = (
-                await bot.client.get_pn_from_lid(jid_)
-                if jid_.Server == "lid"
-                else await bot.client.get_lid_from_pn(jid_)
-            )
-            info = await bot.client.contact.get_contact(jid_)
-        except Exception:
-            pass
-    return info
+    return await get_contact_info(jid_)
 
 
 def get_tg_edit_data(text, raw) -> (dict, Message | None):
@@ -96,6 +111,24 @@ def get_tg_edit_data(text, raw) -> (dict, Message | None):
     return {"raw": msg.SerializeToString()}, msg
 
 
+def reuse_media_message(message: Message, quoted=None) -> Message:
+    """
+    Copies an already uploaded media message so it can be sent to another
+    chat without uploading again; its quote is swapped for `quoted`.
+    """
+    msg = Message()
+    msg.CopyFrom(message)
+    context = get_message_type(msg).contextInfo
+    for field in ("stanzaID", "participant", "remoteJID", "quotedMessage"):
+        context.ClearField(field)
+    if quoted:
+        sender = quoted.Info.MessageSource.Sender
+        context.stanzaID = quoted.Info.ID
+        context.participant = f"{sender.User}@{sender.Server}"
+        context.quotedMessage.CopyFrom(quoted.Message)
+    return msg
+
+
 def get_wa_edit_data(event: Event) -> dict:
     if event.media:
         msg = event.media
@@ -132,10 +165,10 @@ async def replace_mentions_for_tg(client: TelegramClient, text: str) -> str:
 
         try:
             # Fetch user entity
-            entity = await client.get_entity(user_id)
+            entity = await get_tg_entity(client, user_id)
 
             # Verify it's a user account
-            if not isinstance(entity, User):
+            if not (entity and entity.is_user):
                 parts.append(match.group(0))
                 continue
 
@@ -195,12 +228,11 @@ async def replace_wa_mentions(text, event):
             if not lid_address:
                 user_jid = jid.build_jid(user_id)
                 user_info = await get_user_info(user_jid=user_jid)
-                try:
-                    user_id = (await bot.client.get_lid_from_pn(user_jid)).User
-                except Exception:
+                if not (lid := await get_alt_jid(user_jid)):
                     user_id = "XXXXXXXXX" if await user_is_on_wa(user_id) else user_id
                     parts.append(f"@{user_id}")
                     continue
+                user_id = lid.User
             else:
                 user_info = await get_user_info(user_id, "lid")
 
@@ -249,13 +281,12 @@ async def replace_hashed(text: str, wa=True) -> str:
 
 
 async def user_is_on_wa(number: str):
-    response = await bot.client.is_on_whatsapp(number)
-    return response[0].IsIn
+    return await is_on_wa(number)
 
 
 def load_proto(data, jid=False):
     msg = Message() if not jid else JID()
-    msg.ParseFromString(data)
+    msg.ParseFromString(unpack_raw(data))
     return msg
 
 
@@ -419,7 +450,9 @@ async def get_bridge_rheader_wa(event, client):
     else:
         user_id = int(f"-100{event.actor.channel_id}")
         is_user = False
-    user = await client.get_entity(user_id)
+    user = await get_tg_entity(client, user_id)
+    if not user:
+        raise ValueError(f"Could not find the Telegram entity: {user_id}")
     name = f"{
         user.first_name} {
         user.last_name if user.last_name else ''}" if is_user else user.title
@@ -26,7 +26,13 @@ async def enshell(cmd):
         stderr=asyncio.subprocess.PIPE,
         stdin=subprocess.DEVNULL,
     )
-    stdout, stderr = await process.communicate()
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        # Don't leave the command running after its caller gave up
+        process.kill()
+        await process.wait()
+        raise
     # Return the output of the command and the process object
     return (process, stdout.decode(), stderr.decode())
 
@@ -121,6 +127,11 @@ def size_of(file):
     return int(Path(file).stat().st_size)
 
 
+def media_size(media: str | bytes) -> int:
+    """Size of media given as a file path or its contents"""
+    return size_of(media) if isinstance(media, str) else len(media)
+
+
 def size_of_dir(dir_):
     root_directory = Path(dir_)
     return sum(f.stat().st_size for f in root_directory.glob("**/*") if f.is_file())
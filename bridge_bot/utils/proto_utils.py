@@ -0,0 +1,127 @@
+import hashlib
+from pathlib import Path
+
+from bridge_bot import Message
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compact blobs start with a zero byte; field number 0 is invalid protobuf,
+# so a legacy (plain serialized) blob can never be mistaken for one.
+MAGIC = 0
+ZSTD_BLOB = 1
+JID_REF = 2
+
+# Never read back by the bridge, but often the bulk of a stored message
+STRIPPED_FIELDS = {"jpegThumbnail", "quotedMessage"}
+
+DICT_DIR = Path("chat_dbs/dicts")
+DICT_SIZE = 64 * 1024
+COMPRESSION_LEVEL = 9
+
+# Content-addressed JID blobs, shared by every open database
+interned_jids = {}
+_compressor = None
+_decompressors = {}
+
+
+def _strip(msg):
+    for field, value in msg.ListFields():
+        if field.name in STRIPPED_FIELDS:
+            msg.ClearField(field.name)
+        elif field.message_type is None or field.message_type.GetOptions().map_entry:
+            continue
+        elif hasattr(value, "ListFields"):
+            _strip(value)
+        else:
+            # Repeated message field
+            for item in value:
+                _strip(item)
+
+
+def strip_message(data: bytes) -> bytes:
+    """Drops thumbnails & quoted payloads from a serialized Message."""
+    msg = Message()
+    msg.ParseFromString(data)
+    _strip(msg)
+    return msg.SerializeToString()
+
+
+def _dict_path(dict_id):
+    return DICT_DIR / f"{dict_id}.zdict"
+
+
+def _load_dict(dict_id):
+    return zstandard.ZstdCompressionDict(_dict_path(dict_id).read_bytes())
+
+
+def _get_compressor():
+    global _compressor
+    if _compressor is None:
+        dicts = sorted(DICT_DIR.glob("*.zdict"), key=lambda p: p.stat().st_mtime)
+        _compressor = zstandard.ZstdCompressor(
+            level=COMPRESSION_LEVEL,
+            dict_data=_load_dict(dicts[-1].stem) if dicts else None,
+        )
+    return _compressor
+
+
+def _get_decompressor(dict_id):
+    if (decompressor := _decompressors.get(dict_id)) is None:
+        decompressor = zstandard.ZstdDecompressor(
+            dict_data=_load_dict(dict_id) if dict_id else None
+        )
+        _decompressors[dict_id] = decompressor
+    return decompressor
+
+
+def train_dict(samples: list) -> int | None:
+    """
+    Trains a zstd dictionary from stripped message blobs and makes it
+    the one used for new writes. Returns its id.
+    """
+    global _compressor
+    if zstandard is None or not samples:
+        return
+    try:
+        zdict = zstandard.train_dictionary(DICT_SIZE, samples)
+    except zstandard.ZstdError:
+        # Too few or too similar samples
+        return
+    DICT_DIR.mkdir(parents=True, exist_ok=True)
+    _dict_path(zdict.dict_id()).write_bytes(zdict.as_bytes())
+    _compressor = None
+    return zdict.dict_id()
+
+
+def pack_raw(data: bytes) -> bytes:
+    """Strips & compresses a serialized Message for storage."""
+    data = strip_message(data)
+    if zstandard is None:
+        return data
+    packed = bytes((MAGIC, ZSTD_BLOB)) + _get_compressor().compress(data)
+    return packed if len(packed) < len(data) else data
+
+
+def intern_jid(data: bytes) -> (bytes, bytes):
+    """Returns (reference to store, intern key) for a serialized JID."""
+    key = hashlib.blake2b(data, digest_size=8).digest()
+    interned_jids[key] = data
+    return bytes((MAGIC, JID_REF)) + key, key
+
+
+def unpack_raw(data: bytes | None) -> bytes | None:
+    """Reverses pack_raw / intern_jid; legacy blobs are returned as is."""
+    if not data or data[0] != MAGIC:
+        return data
+    kind, body = data[1], data[2:]
+    if kind == JID_REF:
+        return interned_jids[body]
+    if kind == ZSTD_BLOB:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read compacted messages")
+        dict_id = zstandard.get_frame_parameters(body).dict_id
+        return _get_decompressor(dict_id).decompress(body)
+    raise ValueError(f"Unknown stored blob type: {kind}")
@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+
+from bridge_bot import JID, bot, jid
+
+
+@dataclass
+class Route:
+    wa_jid: JID
+    tg_chats: list = field(default_factory=list)
+
+
+# wa_chat -> Route; derived from group_dict["tg_bridges"], never saved
+wa_routes = {}
+
+
+def add_route(wa_chat: str, tg_chat: int):
+    if not (route := wa_routes.get(wa_chat)):
+        route = wa_routes[wa_chat] = Route(jid.build_jid(wa_chat, "g.us"))
+    if tg_chat not in route.tg_chats:
+        route.tg_chats.append(tg_chat)
+
+
+def remove_route(wa_chat: str, tg_chat: int):
+    if not (route := wa_routes.get(wa_chat)):
+        return
+    if tg_chat in route.tg_chats:
+        route.tg_chats.remove(tg_chat)
+    if not route.tg_chats:
+        wa_routes.pop(wa_chat)
+
+
+def rebuild_routes():
+    wa_routes.clear()
+    for bridge in bot.group_dict.setdefault("tg_bridges", {}).values():
+        add_route(bridge.get("wa_chat"), bridge.get("tg_chat"))
+
+
+def get_route(wa_chat: str) -> Route | None:
+    return wa_routes.get(wa_chat)
+
+
+def get_wa_jid(wa_chat: str) -> JID:
+    """Bridged chats reuse their prebuilt JID"""
+    if route := wa_routes.get(wa_chat):
+        return route.wa_jid
+    return jid.build_jid(wa_chat, "g.us")
@@ -5,13 +5,13 @@ import uuid
 from typing import List
 
 import magic
+from media_jobs import WebpToPng, ZipFiles
 from neonize.utils.enum import MediaType
-from wand.image import Image as wand_image
 
 from bridge_bot import StickerPackMessage
 from bridge_bot.config import bot
 
-from .bot_utils import prepare_zip_file_content, sync_to_async
+from .media_worker import run_media_job
 
 sem = asyncio.Semaphore(50)
 
@@ -34,14 +34,6 @@ async def upload_sticker(client, sticker, animated, zip_dict):
     )
 
 
-def webp_to_img(webp):
-    with wand_image(blob=webp, format="webp") as img:
-        with img.convert("png") as img2:
-            img2 = img2.image_get()
-            img2.sample(252, 252)
-            return img2.make_blob(format="png")
-
-
 async def create_stickerpack(
     event, stickers: list, pack_name: str
 ) -> List[StickerPackMessage]:
@@ -83,7 +75,7 @@ async def _process_single_pack(
     sticker_id = f"{uuid.uuid4()}"
 
     tray_icon = f"{sticker_id}.png"
-    cover = await sync_to_async(webp_to_img, stickers[0][0])
+    cover = await run_media_job(WebpToPng(stickers[0][0]))
     zip_dict.update({tray_icon: cover})
 
     file_size = 0
@@ -91,7 +83,7 @@ async def _process_single_pack(
         file_size += len(f)
 
     # Create zip archive
-    sticker_pack = await sync_to_async(prepare_zip_file_content, zip_dict)
+    sticker_pack = await run_media_job(ZipFiles(zip_dict))
 
     # Create cover from first sticker
     thumbnail = await event.client.upload(cover)
@@ -1,5 +1,4 @@
 import asyncio
-import time
 
 from neonize.utils.message import get_poll_update_message
 
@@ -8,26 +7,38 @@ from bridge_bot.config import bot
 from bridge_bot.others.exceptions import CreateSudoBtnError
 
 from .bot_utils import get_sha256, trunc_string
+from .cache_utils import TTLCache
 
-active_poll_dict = {}
+POLL_WAIT = 300
+# poll message id -> poll info; polls nobody waits on expire by themselves
+active_poll_dict = TTLCache(256, POLL_WAIT * 2, negative=lambda info: False)
+# poll message id -> poll info of polls being waited on, moved here by
+# wait_for_button_response so active_poll_dict's size limit can't drop them
+waiters = {}
+
+
+def get_poll_info(msg_id: str) -> dict | None:
+    if poll_info := waiters.get(msg_id):
+        return poll_info
+    return active_poll_dict.lookup(msg_id)[1]
 
 
 async def poll_as_button_handler(event):
-    async with sudo_btn_lock:
-        poll_update = get_poll_update_message(event.message)
-        poll_msg_key = poll_update.pollCreationMessageKey
-        if poll_msg_key.fromMe:
-            return
-        if not (poll_info := active_poll_dict.get(poll_msg_key.ID)):
-            return
-        if poll_info.get("user") != event.from_user.id:
-            return
-        selected = await bot.client.decrypt_poll_vote(event.message)
-        if (conf_btn := poll_info.get("conf_btn")) and conf_btn not in [
-            s.hex() for s in selected.selectedOptions
-        ]:
-            return
-        poll_info.update(selected=selected)
+    poll_update = get_poll_update_message(event.message)
+    poll_msg_key = poll_update.pollCreationMessageKey
+    if poll_msg_key.fromMe:
+        return
+    if not (poll_info := get_poll_info(poll_msg_key.ID)):
+        return
+    if poll_info.get("user") != event.from_user.id:
+        return
+    selected = await bot.client.decrypt_poll_vote(event.message)
+    if (conf_btn := poll_info.get("conf_btn")) and conf_btn not in [
+        s.hex() for s in selected.selectedOptions
+    ]:
+        return
+    if not (future := poll_info["future"]).done():
+        future.set_result(selected)
 
 
 async def create_sudo_button(
@@ -54,23 +65,24 @@ async def create_sudo_button(
             poll_info.update(user=user_id)
             if conf_btn and selectable > 1:
                 poll_info.update({"conf_btn": get_sha256(trunc_string(conf_btn, 100))})
-            active_poll_dict.update({msg.ID: poll_info})
+            # Resolved with the vote by poll_as_button_handler
+            poll_info.update(future=asyncio.get_running_loop().create_future())
+            active_poll_dict.set(msg.ID, poll_info)
             return msg
 
     except Exception as e:
         raise CreateSudoBtnError(e)
 
 
-async def wait_for_button_response(msg_id: str, grace=0.1):
-    s_time = time.time()
-    while True:
-        await asyncio.sleep(grace)
-        if time.time() - s_time > 300:
-            return
-        async with sudo_btn_lock:
-            poll_info = active_poll_dict.get(msg_id)
-            if not poll_info:
-                return
-            if selected := poll_info.get("selected"):
-                active_poll_dict.pop(msg_id)
-                return [poll_info.get(s.hex()) for s in selected.selectedOptions]
+async def wait_for_button_response(msg_id: str, timeout: int = POLL_WAIT):
+    if not (poll_info := get_poll_info(msg_id)):
+        return
+    active_poll_dict.pop(msg_id)
+    waiters[msg_id] = poll_info
+    try:
+        selected = await asyncio.wait_for(poll_info["future"], timeout)
+    except asyncio.TimeoutError:
+        return
+    finally:
+        waiters.pop(msg_id, None)
+    return [poll_info.get(s.hex()) for s in selected.selectedOptions]
@@ -1,4 +1,7 @@
 import asyncio
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
 from io import BytesIO
 from pathlib import Path
 from random import randint
@@ -13,9 +16,12 @@ from telethon.tl.types import (
     InputPhotoFileLocation,
 )
 
+from bridge_bot import conf
+
 from .fast_telethon import download_file as _download_file
 from .fast_telethon import upload_file as _upload_file
 from .log_utils import logger
+from .os_utils import s_remove
 
 TypeLocation = Union[
     Document,
@@ -54,6 +60,68 @@ async def download_file(
         return await event.download_media(file=out)
 
 
+class ByteBudget:
+    """
+    Bounds how many bytes of media are held in memory at once.
+    Reservations are granted in order, so big files aren't starved by
+    small ones; one bigger than the whole budget waits to have it to itself.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+        self._waiting = deque()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        if self.limit <= 0:
+            yield
+            return
+        size = min(size, self.limit)
+        token = object()
+        async with self._cond:
+            self._waiting.append(token)
+            try:
+                await self._cond.wait_for(
+                    lambda: self._waiting[0] is token and self.used + size <= self.limit
+                )
+            finally:
+                self._waiting.remove(token)
+                self._cond.notify_all()
+            self.used += size
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.used -= size
+                self._cond.notify_all()
+
+
+media_budget = ByteBudget(conf.MEDIA_RAM_BUDGET)
+
+
+@asynccontextmanager
+async def spool_media(event, location: TypeLocation):
+    """
+    Downloads an event's media for sending to WhatsApp.
+    Small files are yielded as bytes, bigger ones as the path of a temp file
+    that's removed on exit; sending loads the file whole, so its size is
+    held from the media budget until then.
+    """
+    size = event.file.size or 0
+    async with media_budget.reserve(size):
+        if size <= conf.MEDIA_SPOOL_THRESHOLD:
+            yield await download_file(event.client, location, bytes, event)
+            return
+        path = f"temp/{uuid.uuid4()}{event.file.ext or ''}"
+        try:
+            await download_file(event.client, location, path, event)
+            yield path
+        finally:
+            s_remove(path)
+
+
 async def upload_file(
     client: TelegramClient,
     file: str | BinaryIO,
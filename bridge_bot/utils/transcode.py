@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import shutil
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from os import cpu_count
+from pathlib import Path
+
+from bridge_bot import conf
+from bridge_bot.others.exceptions import TranscodeCancelled
+
+from .bot_utils import write_binary
+from .log_utils import log
+from .media_utils import (
+    WA_VIDEO_LIMIT,
+    VideoPlan,
+    convert_video,
+    plan_fit,
+    probe_media,
+)
+from .os_utils import file_exists, media_size, s_remove, size_of, touch
+
+# Lower runs first
+PRIORITY_BRIDGE = 0
+PRIORITY_CHANNEL = 1
+
+_CORES = cpu_count() or 1
+# x264 already spreads one encode over several cores, so keep at least two per job
+TRANSCODE_WORKERS = max(1, min(conf.WORKERS, _CORES // 2))
+TRANSCODE_THREADS = max(1, _CORES // TRANSCODE_WORKERS)
+
+
+@dataclass(order=True)
+class TranscodeJob:
+    sort_key: tuple
+    key: tuple = field(compare=False)
+    input_path: str = field(compare=False)
+    output_path: str = field(compare=False)
+    plan: VideoPlan = field(compare=False)
+    size: int = field(compare=False)
+    source: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    queued_at: float = field(compare=False, default_factory=time.time)
+    started_at: float | None = field(compare=False, default=None)
+
+
+class TranscodeScheduler:
+    """
+    Runs full transcode jobs on a fixed number of workers, interactive
+    bridge videos & smaller files first.
+    Jobs are keyed by (tg chat id, tg message id) so they can be
+    cancelled when the source message is deleted.
+    """
+
+    def __init__(self, workers: int, threads: int):
+        self.workers = workers
+        self.threads = threads
+        self.jobs = {}
+        self._running = {}
+        self._queue = None
+        self._tasks = []
+        self._seq = itertools.count()
+
+    def _start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(
+        self,
+        key: tuple,
+        input_path: str,
+        output_path: str,
+        plan: VideoPlan,
+        size: int = 0,
+        source: int = PRIORITY_BRIDGE,
+    ):
+        """
+        Queues a transcode and waits for it to finish.
+        Raises TranscodeCancelled if cancel() was called for key.
+        Remuxes are cheap, so they run right away instead of queueing.
+        """
+        if plan.mode in ("copy", "audio"):
+            return await convert_video(input_path, output_path, plan, self.threads)
+        if self._queue is None:
+            self._start()
+        job = TranscodeJob(
+            (source, size, next(self._seq)),
+            key,
+            input_path,
+            output_path,
+            plan,
+            size,
+            source,
+            asyncio.get_running_loop().create_future(),
+        )
+        self.jobs[key] = job
+        self._queue.put_nowait(job)
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            if job.future.cancelled():
+                raise TranscodeCancelled(f"Transcode of {key} was cancelled")
+            # Nobody is waiting for it anymore
+            self.cancel(key)
+            raise
+        finally:
+            if self.jobs.get(key) is job:
+                self.jobs.pop(key)
+
+    def cancel(self, key: tuple) -> bool:
+        if not (job := self.jobs.get(key)):
+            return False
+        if task := self._running.get(key):
+            task.cancel()
+        job.future.cancel()
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.future.done():
+                continue
+            job.started_at = time.time()
+            task = asyncio.create_task(
+                convert_video(job.input_path, job.output_path, job.plan, self.threads)
+            )
+            self._running[job.key] = task
+            try:
+                await asyncio.wait({task})
+            finally:
+                self._running.pop(job.key, None)
+            if job.future.done():
+                continue
+            if task.cancelled():
+                job.future.cancel()
+            elif task.exception():
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(None)
+
+    def stats(self) -> dict:
+        now = time.time()
+        queued = sorted(
+            job
+            for job in self.jobs.values()
+            if not job.started_at and not job.future.done()
+        )
+        running = [self.jobs[key] for key in self._running if key in self.jobs]
+        return {
+            "workers": self.workers,
+            "threads": self.threads,
+            "running": [(job, now - job.started_at) for job in running],
+            "queued": [(job, now - job.queued_at) for job in queued],
+        }
+
+
+transcoder = TranscodeScheduler(TRANSCODE_WORKERS, TRANSCODE_THREADS)
+
+# Fitted videos by Telegram document id, so a source is only fitted once
+FIT_CACHE_DIR = Path("downloads/fitted")
+_fitting = {}
+# Sends using a fitted video, by source id; eviction leaves their files alone
+_pinned = Counter()
+
+
+@contextmanager
+def pin_fitted(source_id: int):
+    """Keeps source_id's fitted video cached while it's being sent"""
+    _pinned[str(source_id)] += 1
+    try:
+        yield
+    finally:
+        _pinned[str(source_id)] -= 1
+        if not _pinned[str(source_id)]:
+            del _pinned[str(source_id)]
+
+
+def fits_from_source(plan: VideoPlan, size: int) -> bool:
+    """
+    Whether a video planned for a full transcode is going to be fitted anyway;
+    the fit re-encodes everything, so it should run on the source instead.
+    """
+    return plan.mode == "full" and conf.FIT_VIDEO_TO_LIMIT and size > WA_VIDEO_LIMIT
+
+
+def _evict_fitted():
+    fitted = sorted(FIT_CACHE_DIR.glob("*.mp4"), key=lambda f: f.stat().st_mtime)
+    excess = len(fitted) - max(conf.FIT_CACHE_SIZE, 1)
+    # The newest is about to be sent, so it always stays;
+    # pinned ones are still being sent & may go over FIT_CACHE_SIZE for a while
+    unpinned = [file for file in fitted[:-1] if file.stem not in _pinned]
+    for file in unpinned[: max(excess, 0)]:
+        s_remove(file)
+
+
+async def _fit(key, source_id, media, source):
+    out_ = f"temp/{source_id}-fitted.mp4"
+    cached = FIT_CACHE_DIR / f"{source_id}.mp4"
+    if isinstance(media, str):
+        in_ = media
+    else:
+        in_ = f"temp/{source_id}-fit.mp4"
+        await write_binary(in_, media)
+    try:
+        if not (plan := plan_fit(await probe_media(in_))):
+            log(e=f"{source_id}: too long to fit under the limit", warning=True)
+            return media
+        await transcoder.submit(key, in_, out_, plan, media_size(media), source)
+        if size_of(out_) > WA_VIDEO_LIMIT:
+            log(e=f"{source_id}: fitted video is still over the limit", warning=True)
+            return media
+        FIT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.move(out_, cached)
+        _evict_fitted()
+        return str(cached)
+    finally:
+        s_remove(out_)
+        if in_ is not media:
+            s_remove(in_)
+
+
+async def fit_video(
+    key: tuple, source_id: int, media: str | bytes, source: int = PRIORITY_BRIDGE
+) -> str | bytes:
+    """
+    Re-encodes a video (path or contents) over WhatsApp's size limit so it
+    can still be sent as a video; returns the fitted file's path, or media
+    unchanged if it can't be made to fit.
+    Callers should hold pin_fitted(source_id) until they're done sending it.
+    """
+    cached = FIT_CACHE_DIR / f"{source_id}.mp4"
+    if file_exists(cached):
+        touch(cached)
+        return str(cached)
+    if (task := _fitting.get(source_id)) is None:
+        task = asyncio.ensure_future(_fit(key, source_id, media, source))
+        _fitting[source_id] = task
+        task.add_done_callback(lambda _: _fitting.pop(source_id, None))
+    return await asyncio.shield(task)
@@ -0,0 +1,75 @@
+import struct
+
+# VP8X feature flags
+ICCP_FLAG = 0x20
+ALPHA_FLAG = 0x10
+EXIF_FLAG = 0x08
+XMP_FLAG = 0x04
+ANIMATION_FLAG = 0x02
+
+
+def _read_chunks(webp: bytes) -> list:
+    if len(webp) < 12 or webp[:4] != b"RIFF" or webp[8:12] != b"WEBP":
+        raise ValueError("Not a WebP file")
+    end = min(len(webp), struct.unpack("<I", webp[4:8])[0] + 8)
+    chunks = []
+    pos = 12
+    while pos + 8 <= end:
+        fourcc = webp[pos : pos + 4]
+        size = struct.unpack("<I", webp[pos + 4 : pos + 8])[0]
+        payload = webp[pos + 8 : pos + 8 + size]
+        if len(payload) != size:
+            raise ValueError(f"Truncated {fourcc!r} chunk")
+        chunks.append((fourcc, payload))
+        pos += 8 + size + (size & 1)
+    return chunks
+
+
+def _chunk(fourcc: bytes, payload: bytes) -> bytes:
+    pad = b"\x00" if len(payload) & 1 else b""
+    return fourcc + struct.pack("<I", len(payload)) + payload + pad
+
+
+def _image_info(fourcc: bytes, payload: bytes) -> (int, int, bool):
+    """Width, height & alpha of a simple (VP8/VP8L) WebP's bitstream"""
+    if fourcc == b"VP8 ":
+        if payload[3:6] != b"\x9d\x01\x2a":
+            raise ValueError("Bad VP8 start code")
+        width, height = struct.unpack("<HH", payload[6:10])
+        return width & 0x3FFF, height & 0x3FFF, False
+    if fourcc == b"VP8L":
+        if payload[0] != 0x2F:
+            raise ValueError("Bad VP8L signature")
+        bits = struct.unpack("<I", payload[1:5])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    raise ValueError(f"Unexpected first chunk {fourcc!r}")
+
+
+def set_webp_exif(webp: bytes, exif: bytes) -> bytes:
+    """
+    Adds or replaces the EXIF chunk of a WebP, like `webpmux -set exif`.
+    Simple (VP8/VP8L) files are converted to the extended (VP8X) format.
+    """
+    chunks = [c for c in _read_chunks(webp) if c[0] != b"EXIF"]
+    if chunks[0][0] == b"VP8X":
+        vp8x = bytearray(chunks[0][1])
+        chunks = chunks[1:]
+    else:
+        width, height, alpha = _image_info(*chunks[0])
+        vp8x = bytearray(10)
+        vp8x[0] = ALPHA_FLAG if alpha else 0
+        vp8x[4:7] = (width - 1).to_bytes(3, "little")
+        vp8x[7:10] = (height - 1).to_bytes(3, "little")
+    vp8x[0] |= EXIF_FLAG
+
+    # EXIF goes after the image data and before XMP / unknown chunks
+    known = {b"ICCP", b"ANIM", b"ANMF", b"ALPH", b"VP8 ", b"VP8L"}
+    at = next(
+        (i for i, (fourcc, _) in enumerate(chunks) if fourcc not in known),
+        len(chunks),
+    )
+    chunks.insert(at, (b"EXIF", exif))
+
+    body = b"WEBP" + _chunk(b"VP8X", bytes(vp8x))
+    body += b"".join(_chunk(fourcc, payload) for fourcc, payload in chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
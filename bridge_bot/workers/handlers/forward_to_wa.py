@@ -4,13 +4,15 @@ import shutil
 from neonize.utils.ffmpeg import AFFmpeg
 from telethon import events
 
-from bridge_bot import bot, heavy_proc_lock, jid
-from bridge_bot.utils.bot_utils import get_sticker_pack, read_binary
+from bridge_bot import bot, conf, jid
+from bridge_bot.others.exceptions import TranscodeCancelled
+from bridge_bot.utils.chat_queue import chat_queues
+from bridge_bot.utils.event_dedupe import first_tg_update
 from bridge_bot.utils.log_utils import logger
 from bridge_bot.utils.media_utils import (
-    all_vid_streams_avc,
-    convert_to_avc,
-    convert_to_wa_sticker,
+    WA_VIDEO_LIMIT,
+    analyze_video,
+    get_wa_sticker,
     is_mp3_audio,
 )
 from bridge_bot.utils.msg_store import (
@@ -25,37 +27,35 @@ from bridge_bot.utils.msg_utils import (
     get_subscription_header,
     get_tg_edit_data,
     load_proto,
+    reuse_media_message,
+    tg_message_kind,
+)
+from bridge_bot.utils.os_utils import media_size, s_remove
+from bridge_bot.utils.tg_transfer import download_file, media_budget, spool_media
+from bridge_bot.utils.transcode import (
+    PRIORITY_CHANNEL,
+    fit_video,
+    fits_from_source,
+    pin_fitted,
+    transcoder,
 )
-from bridge_bot.utils.os_utils import s_remove
-from bridge_bot.utils.tg_transfer import download_file
 
 
-async def forward_texts(event):
-    """Forwards text messages to WA from a Tg channel"""
-    try:
-        chat_id = event.chat_id
-        if not (
-            subscribed_info := bot.group_dict.setdefault("subscribed_channels", {}).get(
-                chat_id
-            )
-        ):
-            return
-
-        func_list = [
-            forward_text(event, chat_id) for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
-    except Exception:
-        await logger(Exception)
+async def fan_out(event, chats, message, text=None):
+    """
+    Sends a media message, built (and so uploaded to WhatsApp) only once,
+    to every chat at the same time; text, if any, follows it as a reply.
+    """
+    await asyncio.gather(
+        *(forward_media(event, chat_id, message, text) for chat_id in chats or [])
+    )
 
 
-async def forward_text(event, wa_chat_id):
+async def forward_media(event, wa_chat_id, message, text=None):
     try:
-        msg = None
+        msg = wa_msg = None
         chat_id = event.chat_id
-        text = event.raw_text
         wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        text = get_subscription_header(event) + conv_tgmd_to_wamd(text, event.entities)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
         if msg:
@@ -64,10 +64,10 @@ async def forward_text(event, wa_chat_id):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-            rep = await bot.client.reply_message(text, wa_msg, to=wa_jid)
-        else:
-            rep = await bot.client.send_message(wa_jid, text)
-        return await save_message(
+        rep = await bot.client.send_message(
+            wa_jid, reuse_media_message(message, wa_msg)
+        )
+        await save_message(
             wa_chat_id,
             chat_id,
             None,
@@ -76,12 +76,25 @@ async def forward_text(event, wa_chat_id):
             rep.ID,
             timestamp=rep.Timestamp,
         )
+        if text:
+            user_jid = bot.client.me.JID
+            wa_msg_ = construct_message(
+                wa_chat_id,
+                user_jid.User,
+                rep.ID,
+                None,
+                "g.us",
+                user_jid.Server,
+                rep.Message,
+            )
+            await bot.client.reply_message(text, wa_msg_, to=wa_jid)
+        return rep.Message
     except Exception:
         await logger(Exception)
 
 
-async def forward_images(event):
-    """Forwards images to WA"""
+async def forward_texts(event):
+    """Forwards text messages to WA from a Tg channel"""
     try:
         chat_id = event.chat_id
         if not (
@@ -90,22 +103,18 @@ async def forward_images(event):
             )
         ):
             return
-        image = await event.download_media(file=bytes)
-        spoiler = False
-        if hasattr(event.media, "spoiler"):
-            spoiler = event.media.spoiler
+
         func_list = [
-            forward_image(event, chat_id, image, spoiler)
-            for chat_id in subscribed_info.get("chats")
+            forward_text(event, chat_id) for chat_id in subscribed_info.get("chats")
         ]
         await asyncio.gather(*func_list)
     except Exception:
         await logger(Exception)
 
 
-async def forward_image(event, wa_chat_id, image, spoiler):
+async def forward_text(event, wa_chat_id):
     try:
-        msg = wa_msg = None
+        msg = None
         chat_id = event.chat_id
         text = event.raw_text
         wa_jid = jid.build_jid(wa_chat_id, "g.us")
@@ -118,13 +127,9 @@ async def forward_image(event, wa_chat_id, image, spoiler):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-        rep = await bot.client.send_image(
-            wa_jid,
-            image,
-            text,
-            quoted=wa_msg,
-            spoiler=spoiler,
-        )
+            rep = await bot.client.reply_message(text, wa_msg, to=wa_jid)
+        else:
+            rep = await bot.client.send_message(wa_jid, text)
         return await save_message(
             wa_chat_id,
             chat_id,
@@ -138,8 +143,8 @@ async def forward_image(event, wa_chat_id, image, spoiler):
         await logger(Exception)
 
 
-async def forward_gifs(event):
-    """Forwards gif messages to WA"""
+async def forward_images(event):
+    """Forwards images to WA"""
     try:
         chat_id = event.chat_id
         if not (
@@ -148,63 +153,54 @@ async def forward_gifs(event):
             )
         ):
             return
-        gif = await event.download_media(file=bytes)
+        image = await event.download_media(file=bytes)
         spoiler = False
         if hasattr(event.media, "spoiler"):
             spoiler = event.media.spoiler
-        func_list = [
-            forward_gif(event, chat_id, gif, spoiler)
-            for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
+        text = get_subscription_header(event) + conv_tgmd_to_wamd(
+            event.raw_text, event.entities
+        )
+        message = await bot.client.build_image_message(image, text, spoiler=spoiler)
+        await fan_out(event, subscribed_info.get("chats"), message)
     except Exception:
         await logger(Exception)
 
 
-async def forward_gif(event, wa_chat_id, gif, spoiler):
+async def forward_gifs(event):
+    """Forwards gif messages to WA"""
     try:
-        msg = wa_msg = None
         chat_id = event.chat_id
-        event.file.name
-        text = event.raw_text
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        up_as_doc = False
-        if len(gif) > 100000000:
-            up_as_doc = True
-        text = get_subscription_header(event) + conv_tgmd_to_wamd(text, event.entities)
-        if event.reply_to:
-            msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
-        if msg:
-            Msg = load_proto(msg.raw)
-            user_jid = load_proto(msg.raw_user, True)
-            wa_msg = construct_message(
-                wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
-            )
-        rep = (
-            await bot.client.send_video(
-                wa_jid,
-                gif,
-                text,
-                quoted=wa_msg,
-                gifplayback=True,
-                is_gif=True,
-                spoiler=spoiler,
-            )
-            if not up_as_doc
-            else await bot.client.send_document(
-                wa_jid, gif, text, quoted=wa_msg, filename=event.file.name
+        if not (
+            subscribed_info := bot.group_dict.setdefault("subscribed_channels", {}).get(
+                chat_id
             )
+        ):
+            return
+        gif = await event.download_media(file=bytes)
+        spoiler = False
+        if hasattr(event.media, "spoiler"):
+            spoiler = event.media.spoiler
+        text = get_subscription_header(event) + conv_tgmd_to_wamd(
+            event.raw_text, event.entities
         )
-        await save_message(
-            wa_chat_id,
-            chat_id,
-            None,
-            rep.Message,
-            event.id,
-            rep.ID,
-            timestamp=rep.Timestamp,
-        )
-        return
+        with pin_fitted(event.file.media.id):
+            if conf.FIT_VIDEO_TO_LIMIT and len(gif) > WA_VIDEO_LIMIT:
+                gif = await fit_video(
+                    (chat_id, event.id), event.file.media.id, gif, PRIORITY_CHANNEL
+                )
+            message = (
+                await bot.client.build_video_message(
+                    gif, text, gifplayback=True, is_gif=True, spoiler=spoiler
+                )
+                if media_size(gif) <= WA_VIDEO_LIMIT
+                else await bot.client.build_document_message(
+                    gif, text, filename=event.file.name
+                )
+            )
+            await fan_out(event, subscribed_info.get("chats"), message)
+    except TranscodeCancelled:
+        # Source message was deleted while fitting it
+        pass
     except Exception:
         await logger(Exception)
 
@@ -219,76 +215,60 @@ async def forward_vids(event):
             )
         ):
             return
+        out_ = None
         if shutil.disk_usage("/").free > event.file.size:
             _id = f"{event.chat.id}:{event.id}"
             in_ = f"temp/{_id}.mp4"
             out_ = f"temp/{_id}-1.mp4"
             await download_file(event.client, event.video, in_, event)
-            if not await all_vid_streams_avc(in_):
-                async with heavy_proc_lock:
-                    await convert_to_avc(in_, out_)
-                s_remove(in_)
+            plan = await analyze_video(in_)
+            if plan.mode != "none" and not fits_from_source(plan, event.file.size):
+                try:
+                    await transcoder.submit(
+                        (chat_id, event.id),
+                        in_,
+                        out_,
+                        plan,
+                        event.file.size,
+                        PRIORITY_CHANNEL,
+                    )
+                except TranscodeCancelled:
+                    s_remove(out_)
+                    return
+                finally:
+                    s_remove(in_)
             else:
                 out_ = in_
-            vid = await read_binary(out_)
-            s_remove(out_)
+            vid = out_
         else:
             vid = await download_file(event.client, event.video, bytes, event)
         spoiler = False
         if hasattr(event.media, "spoiler"):
             spoiler = event.media.spoiler
-        func_list = [
-            forward_vid(event, chat_id, vid, spoiler)
-            for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
-    except Exception:
-        await logger(Exception)
-
-
-async def forward_vid(event, wa_chat_id, vid, spoiler):
-    try:
-        msg = wa_msg = None
-        chat_id = event.chat_id
-        event.file.name
-        text = event.raw_text
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        up_as_doc = False
-        # in_ = await event.download_media(file=in_)
-        if len(vid) > 100000000:
-            up_as_doc = True
-        text = get_subscription_header(event) + conv_tgmd_to_wamd(text, event.entities)
-        if event.reply_to:
-            msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
-        if msg:
-            Msg = load_proto(msg.raw)
-            user_jid = load_proto(msg.raw_user, True)
-            wa_msg = construct_message(
-                wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
-            )
-        rep = (
-            await bot.client.send_video(
-                wa_jid,
-                vid,
-                text,
-                quoted=wa_msg,
-                spoiler=spoiler,
-            )
-            if not up_as_doc
-            else await bot.client.send_document(
-                wa_jid, vid, text, quoted=wa_msg, filename=event.file.name
-            )
-        )
-        await save_message(
-            wa_chat_id,
-            chat_id,
-            None,
-            rep.Message,
-            event.id,
-            rep.ID,
-            timestamp=rep.Timestamp,
+        text = get_subscription_header(event) + conv_tgmd_to_wamd(
+            event.raw_text, event.entities
         )
-        return
+        try:
+            with pin_fitted(event.file.media.id):
+                if conf.FIT_VIDEO_TO_LIMIT and media_size(vid) > WA_VIDEO_LIMIT:
+                    vid = await fit_video(
+                        (chat_id, event.id), event.file.media.id, vid, PRIORITY_CHANNEL
+                    )
+                async with media_budget.reserve(media_size(vid)):
+                    message = (
+                        await bot.client.build_video_message(vid, text, spoiler=spoiler)
+                        if media_size(vid) <= WA_VIDEO_LIMIT
+                        else await bot.client.build_document_message(
+                            vid, text, filename=event.file.name
+                        )
+                    )
+                    await fan_out(event, subscribed_info.get("chats"), message)
+        finally:
+            if out_:
+                s_remove(out_)
+    except TranscodeCancelled:
+        # Source message was deleted while fitting it
+        pass
     except Exception:
         await logger(Exception)
 
@@ -303,59 +283,15 @@ async def forward_audios(event):
             )
         ):
             return
-        audio = await download_file(event.client, event.document, bytes, event)
-        async with AFFmpeg(audio) as ffmpeg:
-            if not await is_mp3_audio(ffmpeg.filepath):
-                audio = await ffmpeg.to_mp3()
-        func_list = [
-            forward_audio(event, chat_id, audio)
-            for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
-    except Exception:
-        await logger(Exception)
-
-
-async def forward_audio(event, wa_chat_id, audio):
-    try:
-        # audio = await event.download_media(file=bytes)
-        chat_id = event.chat_id
-        msg = wa_msg = None
-        text = event.raw_text
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        get_subscription_header
-        text = get_subscription_header(event) + conv_tgmd_to_wamd(text, event.entities)
-        if event.reply_to:
-            msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
-        if msg:
-            Msg = load_proto(msg.raw)
-            user_jid = load_proto(msg.raw_user, True)
-            wa_msg = construct_message(
-                wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
-            )
-        rep = await bot.client.send_audio(
-            wa_jid, audio, bool(event.voice), quoted=wa_msg
-        )
-        await save_message(
-            wa_chat_id,
-            chat_id,
-            None,
-            rep.Message,
-            event.id,
-            rep.ID,
-            timestamp=rep.Timestamp,
-        )
-        user_jid = bot.client.me.JID
-        wa_msg_ = construct_message(
-            wa_chat_id,
-            user_jid.User,
-            rep.ID,
-            None,
-            "g.us",
-            user_jid.Server,
-            rep.Message,
+        text = get_subscription_header(event) + conv_tgmd_to_wamd(
+            event.raw_text, event.entities
         )
-        await bot.client.reply_message(text, wa_msg_, to=wa_jid)
+        async with spool_media(event, event.document) as audio:
+            async with AFFmpeg(audio) as ffmpeg:
+                if not await is_mp3_audio(ffmpeg.filepath):
+                    audio = await ffmpeg.to_mp3()
+            message = await bot.client.build_audio_message(audio, bool(event.voice))
+        await fan_out(event, subscribed_info.get("chats"), message, text)
     except Exception:
         await logger(Exception)
 
@@ -370,46 +306,14 @@ async def forward_docs(event):
             )
         ):
             return
-        # _id = f"{event.chat.id}:{event.id}"
-        # doc = f"temp/{_id}_{event.file.name}"
-        doc = await download_file(event.client, event.document, bytes, event)
-        func_list = [
-            forward_doc(event, chat_id, doc) for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
-    except Exception:
-        await logger(Exception)
-
-
-async def forward_doc(event, wa_chat_id, doc):
-    try:
-
-        chat_id = event.chat_id
-        # doc = await event.download_media(file=in_)
-        msg = wa_msg = None
-        text = event.raw_text
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        text = get_subscription_header(event) + conv_tgmd_to_wamd(text, event.entities)
-        if event.reply_to:
-            msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
-        if msg:
-            Msg = load_proto(msg.raw)
-            user_jid = load_proto(msg.raw_user, True)
-            wa_msg = construct_message(
-                wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
-            )
-        rep = await bot.client.send_document(
-            wa_jid, doc, text, event.file.name, quoted=wa_msg
-        )
-        return await save_message(
-            wa_chat_id,
-            chat_id,
-            None,
-            rep.Message,
-            event.id,
-            rep.ID,
-            timestamp=rep.Timestamp,
+        text = get_subscription_header(event) + conv_tgmd_to_wamd(
+            event.raw_text, event.entities
         )
+        async with spool_media(event, event.document) as doc:
+            message = await bot.client.build_document_message(
+                doc, text, event.file.name
+            )
+        await fan_out(event, subscribed_info.get("chats"), message)
     except Exception:
         await logger(Exception)
 
@@ -424,60 +328,14 @@ async def forward_stickers(event):
             )
         ):
             return
-        sticker = await event.download_media(file=bytes)
-        try:
-            stickerset = await get_sticker_pack(event)
-        except Exception as e:
-            await logger(e=e, warning=True)
-            stickerset = None
-        packname = stickerset.set.title if stickerset else "None"
-        sticker = await convert_to_wa_sticker(sticker, event.file.name, packname)
-        func_list = [
-            forward_sticker(event, chat_id, sticker)
-            for chat_id in subscribed_info.get("chats")
-        ]
-        await asyncio.gather(*func_list)
-    except Exception:
-        await logger(Exception)
-
-
-async def forward_sticker(event, wa_chat_id, sticker):
-    try:
-        chat_id = event.chat_id
-        msg = wa_msg = None
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        text = get_subscription_header(event)
-        if event.reply_to:
-            msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
-        if msg:
-            Msg = load_proto(msg.raw)
-            user_jid = load_proto(msg.raw_user, True)
-            wa_msg = construct_message(
-                wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
-            )
-        rep = await bot.client.send_sticker(
-            wa_jid, sticker, quoted=wa_msg, passthrough=True
-        )
-        await save_message(
-            wa_chat_id,
-            chat_id,
-            None,
-            rep.Message,
-            event.id,
-            rep.ID,
-            timestamp=rep.Timestamp,
-        )
-        user_jid = bot.client.me.JID
-        wa_msg_ = construct_message(
-            wa_chat_id,
-            user_jid.User,
-            rep.ID,
-            None,
-            "g.us",
-            user_jid.Server,
-            rep.Message,
+        sticker = await get_wa_sticker(event)
+        message = await bot.client.build_sticker_message(sticker, passthrough=True)
+        await fan_out(
+            event,
+            subscribed_info.get("chats"),
+            message,
+            get_subscription_header(event),
         )
-        await bot.client.reply_message(text, wa_msg_, to=wa_jid)
     except Exception:
         await logger(Exception)
 
@@ -488,24 +346,41 @@ async def handle_edits(event):
         if bot.tg_client2:
             if event.edit_hide:
                 return
-        chat_id = event.chat_id
-        if not (
-            subscribed_info := bot.group_dict.setdefault("subscribed_channels", {}).get(
-                chat_id
-            )
-        ):
-            return
-        func_list = [
-            relay_edit(event, chat_id) for chat_id in subscribed_info.get("chats")
-        ]
-        for func in func_list:
-            await func
+        # Only the lookups wait behind the channel's earlier posts; the
+        # paced edits below don't hold up its new posts
+        edits = await run_in_order(store_edits, event)
+        for wa_chat_id, wa_id, edit_msg in edits or []:
+            try:
+                await bot.client.edit_message(
+                    jid.build_jid(wa_chat_id, "g.us"), wa_id, edit_msg
+                )
+            except Exception:
+                await logger(Exception)
             await asyncio.sleep(5)
     except Exception:
         await logger(Exception)
 
 
-async def relay_edit(event, wa_chat_id):
+async def store_edits(event) -> list:
+    """
+    Updates the stored copies of an edited post and returns the
+    (wa chat, wa id, edited message) to send for each subscribed chat
+    """
+    chat_id = event.chat_id
+    if not (
+        subscribed_info := bot.group_dict.setdefault("subscribed_channels", {}).get(
+            chat_id
+        )
+    ):
+        return []
+    edits = []
+    for wa_chat_id in subscribed_info.get("chats"):
+        if edit := await store_edit(event, wa_chat_id):
+            edits.append(edit)
+    return edits
+
+
+async def store_edit(event, wa_chat_id):
     try:
         chat_id = event.chat_id
         msg_id = event.id
@@ -517,22 +392,17 @@ async def relay_edit(event, wa_chat_id):
         update_data, edit_msg = get_tg_edit_data(text, msg.raw)
         if not update_data:
             await logger(
-                e=f"@relay_edit: msg does not support editing on Whatsapp's end, msg;\n{msg}",
+                e=f"@store_edit: msg does not support editing on Whatsapp's end, msg;\n{msg}",
                 warning=True,
             )
             return
-        try:
-            await bot.client.edit_message(
-                jid.build_jid(wa_chat_id, "g.us"), msg.wa_id, edit_msg
-            )
-        except Exception:
-            await logger(Exception)
         status = await edit_message(wa_chat_id, chat_id, update_data, msg_id)
         if not status:
             await logger(
-                e=f"@relay_edit: Failed to edit message in database, msg;\n{msg}",
+                e=f"@store_edit: Failed to edit message in database, msg;\n{msg}",
                 error=True,
             )
+        return wa_chat_id, msg.wa_id, edit_msg
     except Exception:
         await logger(Exception)
 
@@ -547,6 +417,8 @@ async def handle_deletes(event):
             )
         ):
             return
+        for msg_id in event.deleted_ids:
+            transcoder.cancel((chat_id, msg_id))
         func_list = [
             relay_delete(event, chat_id) for chat_id in subscribed_info.get("chats")
         ]
@@ -584,44 +456,50 @@ async def relay_delete(event, wa_chat_id):
         await logger(Exception)
 
 
+# tg_message_kind() -> forwarder
+channel_forwarders = {
+    "audio": forward_audios,
+    "document": forward_docs,
+    "gif": forward_gifs,
+    "image": forward_images,
+    "sticker": forward_stickers,
+    "text": forward_texts,
+    "video": forward_vids,
+}
+
+
+async def run_in_order(handler, event):
+    """
+    Queues the handler behind earlier posts of the same channel; a post
+    goes to all subscribed chats at once so its upload can be shared.
+    Posts replayed after a reconnect are skipped.
+    """
+    if not first_tg_update(handler, event):
+        return
+    return await chat_queues.submit((event.chat_id, None), handler, event)
+
+
+def is_subscribed(event) -> bool:
+    return bool(bot.group_dict.setdefault("subscribed_channels", {}).get(event.chat_id))
+
+
+async def forward_new_message(event):
+    """Sends a new post of a subscribed channel to its forwarder"""
+    if not is_subscribed(event):
+        return
+    kind = tg_message_kind(event)
+    if kind == "webpage":
+        # Link previews go out as their photo; ones without a photo are skipped
+        kind = "image" if event.photo else None
+    if not (handler := channel_forwarders.get(kind)):
+        return
+    await run_in_order(handler, event)
+
+
 def add_forward_handlers():
     client = bot.tg_client2 or bot.tg_client
-    client.add_event_handler(
-        forward_audios, events.NewMessage(func=lambda e: e.audio and not e.video_note)
-    )
-    client.add_event_handler(forward_audios, events.NewMessage(func=lambda e: e.voice))
-    client.add_event_handler(
-        forward_docs,
-        events.NewMessage(
-            func=lambda e: e.document
-            and not (
-                e.audio
-                or e.voice
-                or e.gif
-                or e.sticker
-                or e.photo
-                or e.video
-                or e.video_note
-            )
-        ),
-    )
-    client.add_event_handler(forward_gifs, events.NewMessage(func=lambda e: e.gif))
-    client.add_event_handler(forward_images, events.NewMessage(func=lambda e: e.photo))
-    client.add_event_handler(
-        forward_stickers, events.NewMessage(func=lambda e: e.sticker)
-    )
-    client.add_event_handler(
-        forward_texts,
-        events.NewMessage(func=lambda e: e.message.message and not e.media),
-    )
-    client.add_event_handler(
-        forward_vids,
-        events.NewMessage(
-            func=lambda e: e.video and not (e.gif or e.video_note or e.sticker)
-        ),
-    )
-    client.add_event_handler(
-        forward_vids, events.NewMessage(func=lambda e: e.video_note)
-    )
-    client.add_event_handler(handle_edits, events.MessageEdited())
+    # One handler sorts every new message instead of a filter per media kind
+    client.add_event_handler(forward_new_message, events.NewMessage())
+    client.add_event_handler(handle_edits, events.MessageEdited(func=is_subscribed))
+    # Not queued, so a delete can cancel the transcode of a post still in line
     client.add_event_handler(handle_deletes, events.MessageDeleted())
@@ -1,28 +1,39 @@
 import asyncio
 import itertools
-import time
 import uuid
 from collections import deque
 
 from asyncprawcore.exceptions import Redirect
 
 from bridge_bot import bot, conf
+from bridge_bot.startup.after import before_restart
 from bridge_bot.utils.bot_utils import (
-    DummyListener,
     compare_inner_dict_value,
     get_date_from_ts,
+    human_format_bytes,
     human_format_num,
     remove_inactive_wasubs,
+    time_formatter,
 )
+from bridge_bot.utils.chat_queue import chat_queues
 from bridge_bot.utils.db_utils import save2db2
 from bridge_bot.utils.log_utils import logger
-from bridge_bot.utils.msg_store import deinitialize_session, initialize_session
+from bridge_bot.utils.msg_store import (
+    compact_store,
+    deinitialize_session,
+    get_retention,
+    get_store_stats,
+    import_group_dbs,
+    initialize_session,
+)
 from bridge_bot.utils.msg_utils import get_args, user_is_owner
 from bridge_bot.utils.os_utils import re_x, updater
+from bridge_bot.utils.route_utils import add_route, remove_route
 from bridge_bot.utils.sudo_button_utils import (
     create_sudo_button,
     wait_for_button_response,
 )
+from bridge_bot.utils.transcode import PRIORITY_BRIDGE, transcoder
 
 
 async def restart_handler(event, args, client):
@@ -32,6 +43,7 @@ async def restart_handler(event, args, client):
     try:
         rst = await event.reply("*Restarting Please Wait…*")
         message = f"{rst.chat.id}:{rst.id}:{rst.chat.server}"
+        await before_restart()
         re_x("restart", message)
     except Exception:
         await event.reply("An Error Occurred")
@@ -45,6 +57,7 @@ async def update_handler(event, args, client):
             return
         upt_mess = "Updating…"
         reply = await event.reply(f"*{upt_mess}*")
+        await before_restart()
         updater(reply)
     except Exception:
         await logger(Exception)
@@ -98,6 +111,7 @@ async def bridge(event, args, client):
         if not info[0] == y:
             return await event.reply("*Operation Cancelled!*")
         tg_bridges.update({args: {"tg_chat": args, "wa_chat": wa_chat_id}})
+        add_route(wa_chat_id, args)
         active_wa_bridges = bot.group_dict.setdefault("active_wa_bridges", [])
         (
             active_wa_bridges.append(wa_chat_id)
@@ -163,6 +177,7 @@ async def unbridge(event, args, client):
         if not info[0] == y:
             return await event.reply("*Operation Cancelled!*")
         tg_bridges.pop(args)
+        remove_route(wa_chat_id, args)
         if not compare_inner_dict_value(tg_bridges, "wa_chat", wa_chat_id):
             active_wa_bridges.remove(wa_chat_id)
             await deinitialize_session(wa_chat_id)
@@ -388,6 +403,34 @@ def get_list_of_added_chats(s_info: dict) -> str:
     return msg
 
 
+async def wait_for_text_reply(event, rep, user_id: str, timeout: int = 60):
+    """Waits for user_id to reply rep with some text; None on timeout"""
+    reply = asyncio.get_running_loop().create_future()
+
+    async def get_reply(event, _, __):
+        if not ((replied := event.reply_to_message) and replied.id == rep.id):
+            return
+        if event.from_user.id != user_id:
+            return
+        if event.is_actual_media:
+            return await event.reply("why?")
+        if not (text := event.text):
+            return
+        if not reply.done():
+            reply.set_result(text)
+
+    key = bot.add_handler(
+        get_reply,
+        wants=lambda m: m.Info.MessageSource.Chat.User == event.chat.id,
+    )
+    try:
+        return await asyncio.wait_for(reply, timeout)
+    except asyncio.TimeoutError:
+        return
+    finally:
+        bot.unregister(key)
+
+
 async def edit_subscription(event, args, client):
     """
     Edit a telegram subscription
@@ -439,32 +482,11 @@ async def edit_subscription(event, args, client):
             await event.reply(text) if text else None
         text = "*Reply this message with the WhatsApp group id of chat to add/remove*\n_Also accepts '.' to specify current chat_"
         rep = await event.reply(text)
-        listener = DummyListener()
-
-        async def get_reply(event, _, __):
-            if not ((replied := event.reply_to_message) and replied.id == rep.id):
-                return
-            if event.from_user.id != user_id:
-                return
-            if event.is_actual_media:
-                return await event.reply("why?")
-            if not (text := event.text):
-                return
-            listener.response = text
-
-        key = bot.add_handler(get_reply)
-        s_time = time.time()
-        while (time.time() - s_time) < 60:
-            if listener.response:
-                bot.unregister(key)
-                await rep.delete()
-                break
-            await asyncio.sleep(1)
-        else:
-            bot.unregister(key)
-            await rep.delete()
+        response = await wait_for_text_reply(event, rep, user_id)
+        await rep.delete()
+        if not response:
             return await rep.reply("Operation Time out")
-        await info[1](event, f"{args} -id {listener.response}", client)
+        await info[1](event, f"{args} -id {response}", client)
     except Exception:
         await logger(Exception)
 
@@ -749,32 +771,11 @@ async def edit_subreddit_subscription(event, args, client):
             await event.reply(text) if text else None
         text = "*Reply this message with the WhatsApp group id of chat to add/remove*\n_Also accepts '.' to specify current chat_"
         rep = await event.reply(text)
-        listener = DummyListener()
-
-        async def get_reply(event, _, __):
-            if not ((replied := event.reply_to_message) and replied.id == rep.id):
-                return
-            if event.from_user.id != user_id:
-                return
-            if event.is_actual_media:
-                return await event.reply("why?")
-            if not (text := event.text):
-                return
-            listener.response = text
-
-        key = bot.add_handler(get_reply)
-        s_time = time.time()
-        while (time.time() - s_time) < 60:
-            if listener.response:
-                bot.unregister(key)
-                await rep.delete()
-                break
-            await asyncio.sleep(1)
-        else:
-            bot.unregister(key)
-            await rep.delete()
+        response = await wait_for_text_reply(event, rep, user_id)
+        await rep.delete()
+        if not response:
             return await rep.reply("Operation Time out")
-        await info[1](event, f"{args} -id {listener.response}", client)
+        await info[1](event, f"{args} -id {response}", client)
     except Exception:
         await logger(Exception)
 
@@ -798,6 +799,179 @@ async def list_subreddit_subscriptions(event, args, client):
         await logger(Exception)
 
 
+async def migrate_store(event, args, client):
+    """
+    Imports the per-group message databases into the single database store.
+    Requires SINGLE_MSG_DB to be enabled.
+    """
+    try:
+        if not user_is_owner(event.from_user.id):
+            return
+        if not conf.SINGLE_MSG_DB:
+            return await event.reply(
+                "*Set SINGLE_MSG_DB=True and restart before migrating!*"
+            )
+        await event.react("📥")
+        imported = await import_group_dbs()
+        if not imported:
+            return await event.reply("*Nothing to migrate!*")
+        msg = "*Imported:*\n"
+        for i, gc_id in zip(itertools.count(1), imported):
+            msg += f"{i}. {gc_id}; {imported[gc_id]} rows\n"
+        await event.reply(msg)
+        await event.react("✅")
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
+async def compact_store_handler(event, args, client):
+    """
+    Rewrites stored messages in the compact format & vacuums the databases.
+    """
+    try:
+        if not user_is_owner(event.from_user.id):
+            return
+        await event.react("📥")
+        compacted = await compact_store()
+        if not compacted:
+            return await event.reply("*Nothing to compact!*")
+        msg = "*Compacted:*\n"
+        for i, db_name in zip(itertools.count(1), compacted):
+            count, before, after = compacted[db_name]
+            msg += f"{i}. {db_name}; {count} rows, {human_format_bytes(before)} → {human_format_bytes(after)}\n"
+        await event.reply(msg)
+        await event.react("✅")
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
+async def set_retention(event, args, client):
+    """
+    Sets how long bridged message records of the current chat are kept
+    Arguments:
+        -d DAYS: Delete records older than DAYS (0 keeps them forever)
+        -r ROWS: Keep at most ROWS records (0 for unlimited)
+        --reset: Use the MSG_RETENTION_DAYS/MSG_RETENTION_ROWS defaults
+    """
+    try:
+        if not event.chat.is_group:
+            return
+        if not user_is_owner(event.from_user.id):
+            return
+        wa_chat_id = event.chat.id
+        retention = bot.group_dict.setdefault("msg_retention", {})
+        arg = get_args("-d", "-r", ["--reset", "store_true"], to_parse=args or "")
+        if arg.reset:
+            retention.pop(wa_chat_id, None)
+            await save2db2(bot.group_dict, "groups")
+        elif arg.d or arg.r:
+            for value in (arg.d, arg.r):
+                if value and not value.isdigit():
+                    return await event.reply(f"*'{value}' is not a valid number*")
+            days, rows = get_retention(wa_chat_id)
+            retention[wa_chat_id] = [
+                int(arg.d) if arg.d else days,
+                int(arg.r) if arg.r else rows,
+            ]
+            await save2db2(bot.group_dict, "groups")
+        days, rows = get_retention(wa_chat_id)
+        await event.reply(
+            "*Retention:*\n"
+            f"*Max age:* {f'{days} days' if days else 'Forever'}\n"
+            f"*Max records:* {human_format_num(rows) if rows else 'Unlimited'}"
+        )
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
+async def store_stats(event, args, client):
+    """Reports per-group message store size, record counts & last compaction"""
+    try:
+        if not user_is_owner(event.from_user.id):
+            return
+        stats = await get_store_stats()
+        if not stats:
+            return await event.reply("*No message stores!*")
+        msg = "*Message stores:*\n"
+        for i, gc_id in zip(itertools.count(1), stats):
+            info = stats[gc_id]
+            compacted = (
+                get_date_from_ts(info["last_compaction"])
+                if info["last_compaction"]
+                else "Never"
+            )
+            msg += (
+                f"\n{i}. {gc_id}\n"
+                f"> Messages: {human_format_num(info['messages'])}, "
+                f"Reactions: {human_format_num(info['reactions'])}\n"
+                f"> Data: {human_format_bytes(info['data_size'])}, "
+                f"File: {human_format_bytes(info['file_size'])}\n"
+                f"> Compacted: {compacted}\n"
+            )
+        await event.reply(msg)
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
+async def transcode_queue(event, args, client):
+    """Reports running & queued video transcodes"""
+    try:
+        if not user_is_owner(event.from_user.id):
+            return
+        stats = transcoder.stats()
+        msg = (
+            "*Transcodes:*\n"
+            f"> Workers: {stats['workers']}, Threads per job: {stats['threads']}\n"
+            f"> Running: {len(stats['running'])}, Queued: {len(stats['queued'])}\n"
+        )
+        for title, jobs in (("Running", stats["running"]), ("Queued", stats["queued"])):
+            if not jobs:
+                continue
+            msg += f"\n*{title}:*\n"
+            for i, (job, waited) in zip(itertools.count(1), jobs):
+                source = "bridge" if job.source == PRIORITY_BRIDGE else "channel"
+                msg += (
+                    f"{i}. {job.key[0]}:{job.key[1]} ({source}) "
+                    f"{human_format_bytes(job.size)}, {time_formatter(waited)}\n"
+                )
+        await event.reply(msg)
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
+async def chat_queue_stats(event, args, client):
+    """
+    Reports how many bridged messages are waiting per chat
+    Argument:
+        Number of chats to list (default: 10)
+    """
+    try:
+        if not user_is_owner(event.from_user.id):
+            return
+        limit = int(args) if args and args.isdigit() else 10
+        stats = chat_queues.stats()
+        msg = (
+            "*Chat queues:*\n"
+            f"> Running: {stats['running']}/{stats['limit']}, "
+            f"Waiting: {stats['queued']}\n"
+        )
+        if stats["depths"]:
+            msg += "\n*Busiest:*\n"
+        for i, ((source, target), depth) in zip(
+            itertools.count(1), stats["depths"][:limit]
+        ):
+            msg += f"{i}. {source} → {target or 'subscribers'}: {depth}\n"
+        await event.reply(msg)
+    except Exception as e:
+        await logger(Exception)
+        await event.reply(f"*Error:* {e}")
+
+
 async def manage(event, args, client):
     """Lists commands from the manage module"""
     try:
@@ -817,6 +991,14 @@ async def manage(event, args, client):
             f"{pre}rm_rsub - *Remove a chat from an existing subreddit subscription*\n"
             f"{pre}rsubscribe - *Subscribe to a Subreddit*\n"
             f"{pre}runsubscribe - *Unsubscribe from a Subreddit*\n"
+            "\n*#Store:*\n"
+            f"{pre}migrate_store - *Import per-group message databases into the single database*\n"
+            f"{pre}compact_store - *Rewrite stored messages in the compact format*\n"
+            f"{pre}retention - *Set how long bridged messages of the current chat are kept*\n"
+            f"{pre}store_stats - *Show message store sizes & record counts*\n"
+            "\n*#Media:*\n"
+            f"{pre}transcodes - *Show running & queued video transcodes*\n"
+            f"{pre}queues - *Show bridged messages waiting per chat*\n"
             "\n*#Restart:*\n"
             f"{pre}restart - *Restarts bot*\n"
             f"{pre}update - *Update & restarts bot*\n"
@@ -832,6 +1014,12 @@ def add_manage_handlers():
     bot.add_handler(restart_handler, "restart")
     bot.add_handler(update_handler, "update")
     bot.add_handler(manage, "manage")
+    bot.add_handler(migrate_store, "migrate_store")
+    bot.add_handler(compact_store_handler, "compact_store")
+    bot.add_handler(set_retention, "retention")
+    bot.add_handler(store_stats, "store_stats")
+    bot.add_handler(transcode_queue, "transcodes")
+    bot.add_handler(chat_queue_stats, "queues")
     bot.add_handler(
         add_subscriber,
         "add2sub",
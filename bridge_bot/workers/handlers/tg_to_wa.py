@@ -1,25 +1,29 @@
+import asyncio
 import shutil
 from datetime import datetime as dt
+from functools import partial
 
 from neonize.utils.ffmpeg import AFFmpeg
 from telethon import events
 from telethon.tl.types import (
-    MessageMediaWebPage,
     ReactionEmoji,
     UpdateBotMessageReaction,
 )
 
-from bridge_bot import bot, conf, heavy_proc_lock, jid
-from bridge_bot.utils.bot_utils import get_sticker_pack, read_binary
+from bridge_bot import bot, conf
+from bridge_bot.others.exceptions import TranscodeCancelled
+from bridge_bot.utils.chat_queue import chat_queues
+from bridge_bot.utils.event_dedupe import first_tg_update
+from bridge_bot.utils.identity_cache import remember_tg_entity
 from bridge_bot.utils.log_utils import logger
 from bridge_bot.utils.media_utils import (
-    all_vid_streams_avc,
-    convert_to_avc,
-    convert_to_wa_sticker,
+    WA_VIDEO_LIMIT,
+    analyze_video,
+    get_wa_sticker,
     is_mp3_audio,
 )
 from bridge_bot.utils.msg_store import (
-    delete_message,
+    delete_messages,
     edit_message,
     get_message,
     save_message,
@@ -33,9 +37,17 @@ from bridge_bot.utils.msg_utils import (
     is_echo,
     load_proto,
     replace_mentions_for_wa,
+    tg_message_kind,
+)
+from bridge_bot.utils.os_utils import media_size, s_remove
+from bridge_bot.utils.route_utils import get_wa_jid
+from bridge_bot.utils.tg_transfer import download_file, media_budget, spool_media
+from bridge_bot.utils.transcode import (
+    fit_video,
+    fits_from_source,
+    pin_fitted,
+    transcoder,
 )
-from bridge_bot.utils.os_utils import s_remove
-from bridge_bot.utils.tg_transfer import download_file
 
 # To Do: check if file size is properly within constraints
 
@@ -51,7 +63,7 @@ async def text_to_wa(event):
         msg = None
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -94,7 +106,7 @@ async def img_to_wa(event):
         image = await event.download_media(file=bytes)
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -144,12 +156,9 @@ async def gif_to_wa(event):
             spoiler = event.media.spoiler
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         up_as_doc = False
         gif = await event.download_media(file=bytes)
-
-        if len(gif) > 100000000:
-            up_as_doc = True
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -159,22 +168,27 @@ async def gif_to_wa(event):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-        rep = (
-            await bot.client.send_video(
-                wa_jid,
-                gif,
-                text,
-                quoted=wa_msg,
-                gifplayback=True,
-                is_gif=True,
-                spoiler=spoiler,
-                mentions_are_lids=True,
-            )
-            if not up_as_doc
-            else await bot.client.send_document(
-                wa_jid, gif, text, quoted=wa_msg, filename=event.file.name
+        with pin_fitted(event.file.media.id):
+            if conf.FIT_VIDEO_TO_LIMIT and len(gif) > WA_VIDEO_LIMIT:
+                gif = await fit_video((chat_id, event.id), event.file.media.id, gif)
+            if media_size(gif) > WA_VIDEO_LIMIT:
+                up_as_doc = True
+            rep = (
+                await bot.client.send_video(
+                    wa_jid,
+                    gif,
+                    text,
+                    quoted=wa_msg,
+                    gifplayback=True,
+                    is_gif=True,
+                    spoiler=spoiler,
+                    mentions_are_lids=True,
+                )
+                if not up_as_doc
+                else await bot.client.send_document(
+                    wa_jid, gif, text, quoted=wa_msg, filename=event.file.name
+                )
             )
-        )
         await save_message(
             wa_chat_id,
             chat_id,
@@ -184,6 +198,9 @@ async def gif_to_wa(event):
             rep.ID,
             timestamp=rep.Timestamp,
         )
+    except TranscodeCancelled:
+        # Source message was deleted while fitting it
+        pass
     except Exception:
         await logger(Exception)
 
@@ -202,30 +219,38 @@ async def vid_to_wa(event):
             spoiler = event.media.spoiler
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         _id = f"{event.chat.id}:{event.id}"
         in_ = f"temp/{_id}.mp4"
         out_ = f"temp/{_id}-1.mp4"
         up_as_doc = False
         if shutil.disk_usage("/").free > event.file.size:
             await download_file(event.client, event.video, in_, event)
-            if not await all_vid_streams_avc(in_):
-                async with heavy_proc_lock:
-                    rep = await bot.client.send_message(
-                        wa_jid, "Processing a video from tg"
+            plan = await analyze_video(in_)
+            if plan.mode != "none" and not fits_from_source(plan, event.file.size):
+                rep = (
+                    await bot.client.send_message(wa_jid, "Processing a video from tg")
+                    if plan.mode == "full"
+                    else None
+                )
+                try:
+                    await transcoder.submit(
+                        (chat_id, event.id), in_, out_, plan, event.file.size
                     )
-                    await convert_to_avc(in_, out_)
+                except TranscodeCancelled:
+                    s_remove(out_)
+                    return
+                finally:
                     s_remove(in_)
-                    await bot.client.revoke_message(wa_jid, bot.client.me.JID, rep.ID)
-
+                    if rep:
+                        await bot.client.revoke_message(
+                            wa_jid, bot.client.me.JID, rep.ID
+                        )
             else:
                 out_ = in_
-            vid = await read_binary(out_)
-            s_remove(out_)
+            vid = out_
         else:
             vid = await download_file(event.client, event.video, bytes, event)
-        if len(vid) > 100000000:
-            up_as_doc = True
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -235,20 +260,29 @@ async def vid_to_wa(event):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-        rep = (
-            await bot.client.send_video(
-                wa_jid,
-                vid,
-                text,
-                quoted=wa_msg,
-                spoiler=spoiler,
-                mentions_are_lids=True,
-            )
-            if not up_as_doc
-            else await bot.client.send_document(
-                wa_jid, vid, text, quoted=wa_msg, filename=event.file.name
-            )
-        )
+        try:
+            with pin_fitted(event.file.media.id):
+                if conf.FIT_VIDEO_TO_LIMIT and media_size(vid) > WA_VIDEO_LIMIT:
+                    vid = await fit_video((chat_id, event.id), event.file.media.id, vid)
+                if media_size(vid) > WA_VIDEO_LIMIT:
+                    up_as_doc = True
+                async with media_budget.reserve(media_size(vid)):
+                    rep = (
+                        await bot.client.send_video(
+                            wa_jid,
+                            vid,
+                            text,
+                            quoted=wa_msg,
+                            spoiler=spoiler,
+                            mentions_are_lids=True,
+                        )
+                        if not up_as_doc
+                        else await bot.client.send_document(
+                            wa_jid, vid, text, quoted=wa_msg, filename=event.file.name
+                        )
+                    )
+        finally:
+            s_remove(out_)
         await save_message(
             wa_chat_id,
             chat_id,
@@ -258,6 +292,9 @@ async def vid_to_wa(event):
             rep.ID,
             timestamp=rep.Timestamp,
         )
+    except TranscodeCancelled:
+        # Source message was deleted while fitting it
+        pass
     except Exception:
         await logger(Exception)
 
@@ -270,14 +307,10 @@ async def audio_to_wa(event):
             bridge_info := bot.group_dict.setdefault("tg_bridges", {}).get(chat_id)
         ):
             return
-        audio = await download_file(event.client, event.document, bytes, event)
-        async with AFFmpeg(audio) as ffmpeg:
-            if not await is_mp3_audio(ffmpeg.filepath):
-                audio = await ffmpeg.to_mp3()
         msg = wa_msg = None
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -287,9 +320,13 @@ async def audio_to_wa(event):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-        rep = await bot.client.send_audio(
-            wa_jid, audio, bool(event.voice), quoted=wa_msg
-        )
+        async with spool_media(event, event.document) as audio:
+            async with AFFmpeg(audio) as ffmpeg:
+                if not await is_mp3_audio(ffmpeg.filepath):
+                    audio = await ffmpeg.to_mp3()
+            rep = await bot.client.send_audio(
+                wa_jid, audio, bool(event.voice), quoted=wa_msg
+            )
         await save_message(
             wa_chat_id,
             chat_id,
@@ -322,11 +359,10 @@ async def doc_to_wa(event):
             bridge_info := bot.group_dict.setdefault("tg_bridges", {}).get(chat_id)
         ):
             return
-        doc = await download_file(event.client, event.document, bytes, event)
         msg = wa_msg = None
         text = conv_tgmd_to_wamd(event.raw_text, event.entities)
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
+        wa_jid = get_wa_jid(wa_chat_id)
         text = get_bridge_header_wa(event) + replace_mentions_for_wa(text)
         if event.reply_to:
             msg = await get_message(wa_chat_id, chat_id, event.reply_to.reply_to_msg_id)
@@ -336,9 +372,15 @@ async def doc_to_wa(event):
             wa_msg = construct_message(
                 wa_chat_id, user_jid.User, msg.wa_id, None, "g.us", user_jid.Server, Msg
             )
-        rep = await bot.client.send_document(
-            wa_jid, doc, text, event.file.name, quoted=wa_msg, mentions_are_lids=True
-        )
+        async with spool_media(event, event.document) as doc:
+            rep = await bot.client.send_document(
+                wa_jid,
+                doc,
+                text,
+                event.file.name,
+                quoted=wa_msg,
+                mentions_are_lids=True,
+            )
         return await save_message(
             wa_chat_id,
             chat_id,
@@ -362,19 +404,11 @@ async def sticker_to_wa(event):
             return
         _id = f"{event.chat.id}:{event.id}"
         # in_ = f"temp/{_id}_{event.file.name}"
-        sticker = await event.download_media(file=bytes)
         msg = wa_msg = None
         text = ""
         wa_chat_id = bridge_info.get("wa_chat")
-        wa_jid = jid.build_jid(wa_chat_id, "g.us")
-        try:
-            stickerset = await get_sticker_pack(event)
-        except Exception as e:
-            await logger(e=e, warning=True)
-            stickerset = None
-
-        packname = stickerset.set.title if stickerset else "None"
-        sticker = await convert_to_wa_sticker(sticker, event.file.name, packname)
+        wa_jid = get_wa_jid(wa_chat_id)
+        sticker = await get_wa_sticker(event)
         # + replace_mentions_for_wa(text)
         text = get_bridge_header_wa(event)
         if event.reply_to:
@@ -420,27 +454,23 @@ async def delete_for_wa(event):
             bridge_info := bot.group_dict.setdefault("tg_bridges", {}).get(chat_id)
         ):
             return
-        wa_chat_id = bridge_info.get("wa_chat")
         for msg_id in event.deleted_ids:
-            msg = await get_message(wa_chat_id, chat_id, msg_id)
-            if not msg:
-                continue
+            transcoder.cancel((chat_id, msg_id))
+        wa_chat_id = bridge_info.get("wa_chat")
+        deleted = await delete_messages(wa_chat_id, chat_id, event.deleted_ids)
+        semaphore = asyncio.Semaphore(conf.REVOKE_CONCURRENCY)
+
+        async def revoke(msg):
             user_jid = load_proto(msg.raw_user, True)
-            try:
-                await bot.client.revoke_message(
-                    jid.build_jid(wa_chat_id, "g.us"), user_jid, msg.wa_id
-                )
-            except Exception:
-                await logger(Exception)
-            status = await delete_message(wa_chat_id, chat_id, msg_id)
-            if not status:
-                await logger(
-                    e=f"@delete_for_wa: Failed to deleted message from database, msg;\n{msg}",
-                    error=True,
-                )
-            # clean reaction messages in database (on both end)
-            await delete_message(wa_chat_id, chat_id, msg_id, is_reaction=True)
-            await delete_message(wa_chat_id, chat_id, wa_id=msg.wa_id, is_reaction=True)
+            async with semaphore:
+                try:
+                    await bot.client.revoke_message(
+                        get_wa_jid(wa_chat_id), user_jid, msg.wa_id
+                    )
+                except Exception:
+                    await logger(Exception)
+
+        await asyncio.gather(*(revoke(msg) for msg in deleted))
     except Exception:
         await logger(Exception)
 
@@ -471,9 +501,7 @@ async def edit_for_wa(event):
             )
             return
         try:
-            await bot.client.edit_message(
-                jid.build_jid(wa_chat_id, "g.us"), msg.wa_id, edit_msg
-            )
+            await bot.client.edit_message(get_wa_jid(wa_chat_id), msg.wa_id, edit_msg)
         except Exception:
             await logger(Exception)
         status = await edit_message(wa_chat_id, chat_id, update_data, msg_id)
@@ -521,7 +549,7 @@ async def handle_reaction_update(event):
             update_data, edit_msg = get_tg_edit_data(reaction_text, msg.raw)
             try:
                 await bot.client.edit_message(
-                    jid.build_jid(wa_chat_id, "g.us"), msg.wa_id, edit_msg
+                    get_wa_jid(wa_chat_id), msg.wa_id, edit_msg
                 )
             except Exception as edit_err:
                 await logger(f"WA edit failed: {edit_err}", error=True)
@@ -553,7 +581,7 @@ async def handle_reaction_update(event):
             rep = await bot.client.reply_message(
                 reaction_text,
                 wa_msg,
-                to=jid.build_jid(wa_chat_id, "g.us"),
+                to=get_wa_jid(wa_chat_id),
                 mentions_are_lids=True,
             )
             await save_message(
@@ -570,6 +598,51 @@ async def handle_reaction_update(event):
         await logger(Exception)
 
 
+async def webpage_to_wa(event):
+    """Forwards a link preview's photo, if any, then its text to WA"""
+    if event.photo:
+        await img_to_wa(event)
+    await text_to_wa(event)
+
+
+# tg_message_kind() -> forwarder
+bridge_forwarders = {
+    "audio": audio_to_wa,
+    "document": doc_to_wa,
+    "gif": gif_to_wa,
+    "image": img_to_wa,
+    "sticker": sticker_to_wa,
+    "text": text_to_wa,
+    "video": vid_to_wa,
+    "webpage": webpage_to_wa,
+}
+
+
+async def run_in_order(handler, event):
+    """
+    Queues the handler behind earlier messages of the same bridge,
+    skipping updates Telegram sends again after a reconnect
+    """
+    if not first_tg_update(handler, event):
+        return
+    bridge_info = bot.group_dict.setdefault("tg_bridges", {}).get(event.chat_id, {})
+    key = (event.chat_id, bridge_info.get("wa_chat"))
+    await chat_queues.submit(key, handler, event)
+
+
+async def bridge_new_message(event):
+    """Sends a new message of a bridged chat to its forwarder"""
+    # Warms the entity cache used by mentions & reaction headers
+    remember_tg_entity(event.sender)
+    if event.chat_id not in bot.group_dict.setdefault("tg_bridges", {}):
+        return
+    if is_echo(event.sender_id):
+        return
+    if not (handler := bridge_forwarders.get(tg_message_kind(event))):
+        return
+    await run_in_order(handler, event)
+
+
 def add_tg_bridge_handlers():
     client = (
         bot.tg_client2 if (bot.tg_client2 and conf.UB_REC_EVENTS) else bot.tg_client
@@ -583,61 +656,16 @@ def add_tg_bridge_handlers():
     def chat(event):
         return event.chat_id in active_tg_bridges
 
-    handlers = [
-        (audio_to_wa, [lambda e: e.audio and not e.video_note, lambda e: e.voice]),
-        (
-            doc_to_wa,
-            [
-                lambda e: (
-                    e.document
-                    and not (
-                        e.audio
-                        or e.voice
-                        or e.gif
-                        or e.sticker
-                        or e.photo
-                        or e.video
-                        or e.video_note
-                    )
-                )
-            ],
-        ),
-        (gif_to_wa, [lambda e: e.gif]),
-        (img_to_wa, [lambda e: e.photo]),
-        (sticker_to_wa, [lambda e: e.sticker]),
-        (
-            text_to_wa,
-            [
-                lambda e: e.text
-                and (
-                    not e.media
-                    or (e.media and isinstance(e.media, MessageMediaWebPage))
-                )
-            ],
-        ),
-        (
-            vid_to_wa,
-            [
-                lambda e: e.video and not (e.gif or e.video_note or e.sticker),
-                lambda e: e.video_note,
-            ],
-        ),
-    ]
-
-    # Register all handlers
-    for handler, filters in handlers:
-        for event_filter in filters:
-
-            def full_filter(e, f=event_filter):
-                return chat(e) and not_echo(e) and f(e)
-
-            client.add_event_handler(handler, events.NewMessage(func=full_filter))
+    # One handler sorts every new message instead of a filter per media kind
+    client.add_event_handler(bridge_new_message, events.NewMessage())
 
+    # Not queued, so a delete can cancel the transcode of a message still in line
     client.add_event_handler(
         delete_for_wa, events.MessageDeleted(func=lambda e: chat(e))
     )
     client.add_event_handler(
-        edit_for_wa, events.MessageEdited(func=lambda e: chat(e) and not_echo(e))
+        partial(run_in_order, edit_for_wa),
+        events.MessageEdited(func=lambda e: chat(e) and not_echo(e)),
     )
     bot.tg_client.add_event_handler(
         handle_reaction_update, events.Raw(UpdateBotMessageReaction)
@@ -2,12 +2,15 @@ import asyncio
 import io
 from datetime import datetime as dt
 
+from media_jobs import WebpToWebm
 from telethon.types import DocumentAttributeSticker, InputStickerSetEmpty
-from wand.image import Image as wand_image
+from telethon.utils import get_attributes
 
 from bridge_bot.config import bot
+from bridge_bot.utils.chat_queue import chat_queues
 from bridge_bot.utils.log_utils import logger
 from bridge_bot.utils.media_utils import get_video_thumbnail
+from bridge_bot.utils.media_worker import run_media_job
 from bridge_bot.utils.msg_store import (
     delete_message,
     edit_message,
@@ -22,9 +25,45 @@ from bridge_bot.utils.msg_utils import (
     whatsapp_md_to_telegram_md,
 )
 from bridge_bot.utils.parse_md import parse as custom_parse
+from bridge_bot.utils.route_utils import get_route
 from bridge_bot.utils.tg_transfer import upload_file
 
 
+def run_once(event, key, func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) once per event; the handlers for every
+    bridged Telegram chat await the same task.
+    """
+    if (task := event.shared_results.get(key)) is None:
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        event.shared_results[key] = task
+    return task
+
+
+def as_file(data: bytes, name: str) -> io.BytesIO:
+    file = io.BytesIO(data)
+    file.name = name
+    return file
+
+
+async def get_media(event) -> bytes:
+    return await run_once(event, "media", event.download)
+
+
+async def get_upload(event, name: str, data: bytes | None = None):
+    """
+    Uploads the event's media (or data) to Telegram once.
+    Returns the InputFile, or None if the upload failed.
+    """
+
+    async def upload():
+        return await upload_file(
+            bot.tg_client, as_file(data or await get_media(event), name)
+        )
+
+    return await run_once(event, "upload", upload)
+
+
 async def text_to_tg(event, tg_chat_id, client):
     """Forwards text messages to TG"""
     try:
@@ -61,9 +100,8 @@ async def img_to_tg(event, tg_chat_id, client):
     try:
         chat_id = event.chat.id
         msg = None
-        image = await event.download()
-        image = io.BytesIO(image)
-        image.name = "image." + event.media.mimetype.split("/")[1]
+        name = "image." + event.media.mimetype.split("/")[1]
+        image = await get_upload(event, name) or as_file(await get_media(event), name)
         text = await replace_mentions_for_tg(bot.tg_client, event.caption)
         text = await replace_wa_mentions(text, event)
         text = add_bridge_header_tg(whatsapp_md_to_telegram_md(text), event.from_user)
@@ -96,9 +134,8 @@ async def vid_to_tg(event, tg_chat_id, client):
     try:
         chat_id = event.chat.id
         msg = None
-        video_ = await event.download()
-        video = io.BytesIO(video_)
-        video.name = (
+        video_ = await get_media(event)
+        name = (
             "video_"
             + dt.now().isoformat("_", "seconds")
             + "."
@@ -111,8 +148,8 @@ async def vid_to_tg(event, tg_chat_id, client):
             msg = await get_message(
                 chat_id, tg_chat_id, wa_id=event.reply_to_message.id
             )
-        thum = await get_video_thumbnail(video_)
-        video = await upload_file(bot.tg_client, video) or video
+        thum = await run_once(event, "thumbnail", get_video_thumbnail, video_)
+        video = await get_upload(event, name) or as_file(video_, name)
         rep = await bot.tg_client.send_file(
             tg_chat_id,
             video,
@@ -146,9 +183,18 @@ async def audio_to_tg(event, tg_chat_id, client):
         else:
             ext = ".mp3"
             name = "audio"
-        audio = await event.download()
-        audio = io.BytesIO(audio)
-        audio.name = f"{name}_" + dt.now().isoformat("_", "seconds") + ext
+        name = f"{name}_" + dt.now().isoformat("_", "seconds") + ext
+        audio = await get_media(event)
+        # Attributes can't be read back from an uploaded InputFile
+        attributes, mime_type = await run_once(
+            event,
+            "attributes",
+            asyncio.to_thread,
+            get_attributes,
+            as_file(audio, name),
+            voice_note=is_ptt,
+        )
+        audio = await get_upload(event, name) or as_file(audio, name)
         # text = await replace_mentions_for_tg(bot.tg_client, event.caption)
         text = ""
         text = add_bridge_header_tg(whatsapp_md_to_telegram_md(text), event.from_user)
@@ -159,6 +205,8 @@ async def audio_to_tg(event, tg_chat_id, client):
         rep = await bot.tg_client.send_file(
             tg_chat_id,
             audio,
+            attributes=attributes,
+            mime_type=mime_type,
             caption=text,
             reply_to=msg.tg_id if msg else None,
             voice_note=is_ptt,
@@ -182,13 +230,13 @@ async def doc_to_tg(event, tg_chat_id, client):
     try:
         chat_id = event.chat.id
         msg = None
-        document = await event.download()
-        document = io.BytesIO(document)
-        document.name = event.media.fileName
+        name = event.media.fileName
         text = await replace_mentions_for_tg(bot.tg_client, event.caption)
         text = await replace_wa_mentions(text, event)
         text = add_bridge_header_tg(whatsapp_md_to_telegram_md(text), event.from_user)
-        document = await upload_file(bot.tg_client, document) or document
+        document = await get_upload(event, name) or as_file(
+            await get_media(event), name
+        )
         if event.reply_to_message:
             msg = await get_message(
                 chat_id, tg_chat_id, wa_id=event.reply_to_message.id
@@ -214,21 +262,21 @@ async def doc_to_tg(event, tg_chat_id, client):
         await logger(Exception)
 
 
+async def convert_sticker(event) -> (bytes, str):
+    sticker = await get_media(event)
+    if not event.sticker.isAnimated:
+        return sticker, "webp"
+    return await run_media_job(WebpToWebm(sticker)), "webm"
+
+
 async def sticker_to_tg(event, tg_chat_id, client):
     """Forwards sticker messages to TG"""
     try:
         chat_id = event.chat.id
-        ext = "webp"
         msg = None
-        sticker = await event.download()
-        if event.sticker.isAnimated:
-            ext = "webm"
-            with wand_image(blob=sticker, format="webp") as img:
-                with img.convert("webm") as img2:
-                    img2.coalesce()
-                    sticker = img2.make_blob(format="webm")
-        sticker = io.BytesIO(sticker)
-        sticker.name = "sticker." + ext
+        sticker, ext = await run_once(event, "sticker", convert_sticker, event)
+        name = "sticker." + ext
+        sticker = await get_upload(event, name, sticker) or as_file(sticker, name)
         text = ""
         text = add_bridge_header_tg(whatsapp_md_to_telegram_md(text), event.from_user)
         if event.reply_to_message:
@@ -396,18 +444,20 @@ filter_dict = {
 
 
 async def forward_events(event, _, client):
-    chat_id = event.chat.id
-    if chat_id not in bot.group_dict.get("active_wa_bridges"):
+    if not (route := get_route(event.chat.id)):
         return
     if not (handler := filter_dict.get(event.short_name)):
         return
     forwarders = [
-        handler(event, bridge.get("tg_chat"), client)
-        for bridge in bot.group_dict.setdefault("tg_bridges", {}).values()
-        if bridge.get("wa_chat") == chat_id
+        chat_queues.submit((event.chat.id, tg_chat), handler, event, tg_chat, client)
+        for tg_chat in route.tg_chats
     ]
     await asyncio.gather(*forwarders)
 
 
+def is_bridged(message) -> bool:
+    return get_route(message.Info.MessageSource.Chat.User) is not None
+
+
 def add_wa_bridge_handlers():
-    bot.add_handler(forward_events)
+    bot.add_handler(forward_events, wants=is_bridged)
@@ -0,0 +1,78 @@
+"""
+Jobs run by the media worker processes (bridge_bot/utils/media_worker.py).
+
+The workers are spawned and only import this module, so it must never
+import bridge_bot: doing so would build another pair of clients in every
+worker.
+"""
+
+import io
+import os
+import zipfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import ClassVar
+
+from wand.image import Image as wand_image
+
+
+def report_worker(started):
+    """Pool initializer; tells the bot which processes run its jobs"""
+    started.put(os.getpid())
+
+
+@dataclass
+class MediaJob(ABC):
+    """
+    A CPU-bound conversion run in a worker process.
+    Jobs are pickled to the worker, so they should only hold plain data.
+    """
+
+    # Seconds before the job is given up; None uses MEDIA_JOB_TIMEOUT
+    timeout: ClassVar[int | None] = None
+
+    @abstractmethod
+    def run(self):
+        pass
+
+
+@dataclass
+class WebpToWebm(MediaJob):
+    """Animated WhatsApp sticker -> webm Telegram video sticker"""
+
+    webp: bytes
+
+    def run(self) -> bytes:
+        with wand_image(blob=self.webp, format="webp") as img:
+            with img.convert("webm") as img2:
+                img2.coalesce()
+                return img2.make_blob(format="webm")
+
+
+@dataclass
+class WebpToPng(MediaJob):
+    """First frame of a sticker, resized; used as a sticker pack's tray icon"""
+
+    webp: bytes
+    size: int = 252
+
+    def run(self) -> bytes:
+        with wand_image(blob=self.webp, format="webp") as img:
+            with img.convert("png") as img2:
+                img2 = img2.image_get()
+                img2.sample(self.size, self.size)
+                return img2.make_blob(format="png")
+
+
+@dataclass
+class ZipFiles(MediaJob):
+    """{name in archive: contents} -> zip archive"""
+
+    files: dict
+
+    def run(self) -> bytes:
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for name, data in self.files.items():
+                zip_file.writestr(name, data)
+        return zip_buffer.getvalue()
@@ -0,0 +1,62 @@
+"""
+Lets the benchmarks import bridge_bot modules without running the
+package's __init__, which truncates logs.txt and builds the Telegram &
+WhatsApp clients. Run the benchmarks from the repo root, e.g.
+    python scripts/bench_msg_store.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Config() exits without these; the benchmarks never connect
+for name in ("API_ID", "API_HASH", "BOT_TOKEN", "OWNER"):
+    os.environ.setdefault(name, "0")
+
+
+def load_package(**attrs) -> types.ModuleType:
+    """
+    Registers a bare bridge_bot package exposing bot, conf & attrs, the
+    names its modules import from it.
+    """
+    pkg = types.ModuleType("bridge_bot")
+    pkg.__path__ = [str(ROOT / "bridge_bot")]
+    sys.modules["bridge_bot"] = pkg
+    from bridge_bot.config import bot, conf
+
+    pkg.asyncio = asyncio
+    pkg.bot = bot
+    pkg.conf = conf
+    pkg.version_file = "version.txt"
+    pkg.__dict__.update(attrs)
+    return pkg
+
+
+def timeit(func, *args, number: int = 1000) -> float:
+    """Average seconds per call of func(*args)"""
+    start = time.perf_counter()
+    for _ in range(number):
+        func(*args)
+    return (time.perf_counter() - start) / number
+
+
+async def atimeit(func, *args, number: int = 1000) -> float:
+    """Average seconds per call of await func(*args)"""
+    start = time.perf_counter()
+    for _ in range(number):
+        await func(*args)
+    return (time.perf_counter() - start) / number
+
+
+def report(title: str, headers: list, rows: list):
+    """Prints (name, seconds per op, ...) rows as microseconds"""
+    print(f"\n{title}")
+    print(f"  {'':<28}" + "".join(f"{header:>14}" for header in headers))
+    for name, *timings in rows:
+        cells = "".join(f"{t * 1e6:>14.1f}" for t in timings)
+        print(f"  {name:<28}{cells}")
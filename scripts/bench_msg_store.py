@@ -0,0 +1,87 @@
+"""
+Per-operation latency of the message store's ORM & Core backends
+(MSG_STORE_BACKEND), run against a temporary SQLite database with the
+lookup cache off so every call reaches SQLite.
+    python scripts/bench_msg_store.py [operations per kind, default 500]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench_env import load_package, report
+from neonize.proto.Neonize_pb2 import JID
+from neonize.proto.waE2E.WAWebProtobufsE2E_pb2 import Message
+from neonize.utils import jid
+
+load_package(JID=JID, Message=Message, jid=jid)
+
+from bridge_bot.config import conf  # noqa: E402
+from bridge_bot.utils import msg_store  # noqa: E402
+
+GC_ID = "bench"
+CHAT_ID = -1001234567890
+USER = JID(User="1234567890", Server="s.whatsapp.net")
+
+
+async def timed(func, args_list) -> float:
+    start = time.perf_counter()
+    for args in args_list:
+        await func(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+async def run_backend(backend: str, count: int) -> dict:
+    conf.MSG_STORE_BACKEND = backend
+    conf.MSG_WRITE_BEHIND = False
+    msg_store.msg_cache.maxsize = 0
+    msg_store.msg_cache.clear()
+    # Each backend gets a fresh database file
+    msg_store.schema_ready.clear()
+    msg_store.interned_in.clear()
+    await msg_store.initialize_session(GC_ID)
+    ids = range(1, count + 1)
+    msg = Message(conversation="benchmark message " * 8)
+    timings = {}
+    try:
+        timings["save_message"] = await timed(
+            msg_store.save_message,
+            [(GC_ID, CHAT_ID, USER, msg, i, f"WA{i}", i) for i in ids],
+        )
+        timings["get_message (tg_id)"] = await timed(
+            msg_store.get_message, [(GC_ID, CHAT_ID, i) for i in ids]
+        )
+        timings["get_message (wa_id)"] = await timed(
+            msg_store.get_message, [(GC_ID, CHAT_ID, None, f"WA{i}") for i in ids]
+        )
+        timings["edit_message"] = await timed(
+            msg_store.edit_message,
+            [(GC_ID, CHAT_ID, {"raw": b"edited"}, i) for i in ids],
+        )
+        timings["delete_message"] = await timed(
+            msg_store.delete_message, [(GC_ID, CHAT_ID, i) for i in ids]
+        )
+    finally:
+        await msg_store.deinitialize_session(GC_ID)
+    return timings
+
+
+async def main(count: int):
+    results = {}
+    cwd = os.getcwd()
+    for backend in ("orm", "core"):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.mkdir("chat_dbs")
+            try:
+                results[backend] = await run_backend(backend, count)
+            finally:
+                os.chdir(cwd)
+    rows = [(op, results["orm"][op], results["core"][op]) for op in results["orm"]]
+    report(f"µs per operation, {count} of each", ["orm", "core"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
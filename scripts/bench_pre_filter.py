@@ -0,0 +1,141 @@
+"""
+WhatsApp events handled per second by on_message's dispatch step: building
+an Event (and its replied message) for every event, as before pre_filter,
+vs pre_filter + building only the events a handler wants. The events are
+made-up MessageEv protos in a typical mix of status updates, sender key
+messages & chatter in unbridged groups, bridged messages and commands.
+    python scripts/bench_pre_filter.py [events, default 20000]
+"""
+
+import sys
+import time
+
+from bench_env import load_package
+from neonize.aioze.client import NewAClient
+from neonize.events import MessageEv
+from neonize.proto.Neonize_pb2 import JID
+from neonize.proto.Neonize_pb2 import Message as base_msg
+from neonize.proto.Neonize_pb2 import MessageInfo as base_msg_info
+from neonize.proto.Neonize_pb2 import MessageSource as base_msg_source
+from neonize.proto.Neonize_pb2 import SendResponse
+from neonize.proto.waE2E.WAWebProtobufsE2E_pb2 import (
+    ContextInfo,
+    ExtendedTextMessage,
+    Message,
+    SenderKeyDistributionMessage,
+)
+from neonize.utils import jid
+
+load_package(
+    JID=JID,
+    Message=Message,
+    MessageEv=MessageEv,
+    NewAClient=NewAClient,
+    SendResponse=SendResponse,
+    base_msg=base_msg,
+    base_msg_info=base_msg_info,
+    base_msg_source=base_msg_source,
+    jid=jid,
+)
+
+from bridge_bot.config import bot, conf  # noqa: E402
+from bridge_bot.utils import events  # noqa: E402
+
+BRIDGED = {f"1203630{i:05}" for i in range(20)}
+USER = JID(User="2348012345678", Server="s.whatsapp.net")
+bot.client = type("Client", (), {"me": type("Me", (), {"JID": USER, "LID": USER})})
+
+
+def event(chat: JID, message: Message, n: int) -> base_msg:
+    return base_msg(
+        Message=message,
+        Info=base_msg_info(
+            ID=f"3EB0{n:016X}",
+            Type="text",
+            MessageSource=base_msg_source(
+                Chat=chat, Sender=USER, SenderAlt=USER, IsGroup=True
+            ),
+        ),
+    )
+
+
+def reply(text: str) -> Message:
+    return Message(
+        extendedTextMessage=ExtendedTextMessage(
+            text=text,
+            contextInfo=ContextInfo(
+                stanzaID="3EB0AAAA",
+                participant="2348000000000@s.whatsapp.net",
+                quotedMessage=Message(conversation="earlier message " * 4),
+            ),
+        )
+    )
+
+
+def make_events(count: int) -> list:
+    status = JID(User="status", Server="broadcast")
+    unbridged = [JID(User=f"1203631{i:05}", Server="g.us") for i in range(200)]
+    bridged = [JID(User=chat, Server="g.us") for chat in sorted(BRIDGED)]
+    sender_key = Message(
+        senderKeyDistributionMessage=SenderKeyDistributionMessage(groupID="x")
+    )
+    # (share of events, chat, message)
+    mix = [
+        (30, lambda n: status, lambda n: Message(conversation="status update")),
+        (15, lambda n: unbridged[n % 200], lambda n: sender_key),
+        (35, lambda n: unbridged[n % 200], lambda n: reply(f"chatter {n}")),
+        (15, lambda n: bridged[n % 20], lambda n: reply(f"bridged {n}")),
+        (
+            5,
+            lambda n: unbridged[n % 200],
+            lambda n: Message(conversation=f"{conf.CMD_PREFIX}ping"),
+        ),
+    ]
+    out = []
+    for n in range(count):
+        pick = n % 100
+        for share, chat, message in mix:
+            if pick < share:
+                out.append(event(chat(n), message(n), n))
+                break
+            pick -= share
+    return out
+
+
+def before(messages: list):
+    for message in messages:
+        events.construct_event(message).reply_to_message
+
+
+def after(messages: list):
+    for message in messages:
+        if events.pre_filter(message) is None:
+            continue
+        events.construct_event(message)
+
+
+def per_second(func, messages: list) -> float:
+    start = time.perf_counter()
+    func(messages)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main(count: int):
+    async def noop(*args):
+        pass
+
+    events.function_dict[conf.CMD_PREFIX + "ping"] = noop
+    bot.add_handler(noop, wants=lambda m: m.Info.MessageSource.Chat.User in BRIDGED)
+    messages = make_events(count)
+    kept = sum(events.pre_filter(message) is not None for message in messages)
+    rows = [
+        ("construct_event (before)", per_second(before, messages)),
+        ("pre_filter (after)", per_second(after, messages)),
+    ]
+    print(f"\nevents per second, {count} events ({kept} reach a handler)")
+    for name, rate in rows:
+        print(f"  {name:<28}{rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,64 @@
+"""
+WhatsApp -> Telegram bridge lookup: the old scan over every bridge vs
+the wa_chat -> Route index in route_utils, at 1k & 10k bridges.
+    python scripts/bench_routes.py
+"""
+
+from bench_env import load_package, report, timeit
+from neonize.proto.Neonize_pb2 import JID
+from neonize.utils import jid
+
+load_package(JID=JID, jid=jid)
+
+from bridge_bot.config import bot  # noqa: E402
+from bridge_bot.utils.route_utils import get_route, rebuild_routes  # noqa: E402
+
+
+def scan_bridges(chat_id):
+    """forward_events' lookup before the index"""
+    if chat_id not in bot.group_dict.get("active_wa_bridges"):
+        return
+    return [
+        bridge.get("tg_chat")
+        for bridge in bot.group_dict.setdefault("tg_bridges", {}).values()
+        if bridge.get("wa_chat") == chat_id
+    ]
+
+
+def indexed(chat_id):
+    if route := get_route(chat_id):
+        return route.tg_chats
+
+
+def build(count: int):
+    wa_chats = [f"1203630{i:011d}" for i in range(count)]
+    bot.group_dict = {
+        "active_wa_bridges": wa_chats,
+        "tg_bridges": {
+            -1000000000000 - i: {"wa_chat": wa_chat, "tg_chat": -1000000000000 - i}
+            for i, wa_chat in enumerate(wa_chats)
+        },
+    }
+    rebuild_routes()
+    return wa_chats
+
+
+def main():
+    rows = []
+    for count in (1000, 10000):
+        wa_chats = build(count)
+        # Worst case for the scan: the last bridge, plus an unbridged chat
+        for label, chat in (("last bridge", wa_chats[-1]), ("unbridged", "999")):
+            assert scan_bridges(chat) == indexed(chat)
+            rows.append(
+                (
+                    f"{count} bridges, {label}",
+                    timeit(scan_bridges, chat, number=200),
+                    timeit(indexed, chat, number=200),
+                )
+            )
+    report("µs per lookup", ["scan", "index"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Per-sticker cost of adding the pack EXIF: the old webpmux run (exif &
+sticker written to temp/, one process per sticker, result read back) vs
+webp_utils.set_webp_exif in memory. The webpmux column needs webpmux on
+PATH. Uses the test fixtures unless sticker files are given.
+    python scripts/bench_webp_exif.py [sticker.webp ...]
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from bench_env import ROOT, atimeit, load_package, report, timeit
+
+load_package()
+
+from bridge_bot.utils.webp_utils import set_webp_exif  # noqa: E402
+
+FIXTURES = ROOT / "tests" / "fixtures" / "webp"
+EXIF = (FIXTURES / "sticker.exif").read_bytes()
+
+
+async def webpmux_exif(sticker: bytes, temp: str) -> bytes:
+    """add_sticker_exif before set_webp_exif"""
+    base = os.path.join(temp, str(uuid.uuid4()))
+    exif_file, in_file, out_file = base + "_exif", base + "_in.webp", base + ".webp"
+    Path(exif_file).write_bytes(EXIF)
+    Path(in_file).write_bytes(sticker)
+    process = await asyncio.create_subprocess_exec(
+        "webpmux",
+        "-set",
+        "exif",
+        exif_file,
+        in_file,
+        "-o",
+        out_file,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    await process.wait()
+    buf = Path(out_file).read_bytes()
+    for file in (exif_file, in_file, out_file):
+        os.remove(file)
+    return buf
+
+
+async def main(files: list):
+    has_webpmux = bool(shutil.which("webpmux"))
+    rows = []
+    with tempfile.TemporaryDirectory() as temp:
+        for file in files:
+            sticker = Path(file).read_bytes()
+            row = [f"{Path(file).name} ({len(sticker)} B)"]
+            if has_webpmux:
+                row.append(await atimeit(webpmux_exif, sticker, temp, number=100))
+            row.append(timeit(set_webp_exif, sticker, EXIF, number=10000))
+            rows.append(row)
+    headers = ["webpmux", "in memory"] if has_webpmux else ["in memory"]
+    report("µs per sticker", headers, rows)
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or [
+        f for f in sorted(FIXTURES.glob("*.webp")) if ".expected" not in f.name
+    ]
+    asyncio.run(main(files))